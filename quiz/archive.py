@@ -0,0 +1,120 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .content import invalidate_quiz_body
+from .models import (
+    ArchivedSession, Choice, Question, Quiz, QuizResult, QuizSession, SessionParticipant,
+)
+from .scoring import invalidate_answer_key
+
+
+_archiving = ContextVar('quiz_archiving', default=False)
+
+
+def is_archiving():
+    """
+    Whether the current thread is deleting rows for archive_batch.
+    """
+    return _archiving.get()
+
+
+def archive_cutoff(days=None):
+    days = getattr(settings, 'QUIZ_ARCHIVE_AFTER_DAYS', 30) if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_sessions(cutoff):
+    """
+    Finished sessions that ended before `cutoff`. Sessions finished before
+    finished_at was recorded fall back to their creation time.
+    """
+    return QuizSession.objects.filter(
+        Q(finished_at__lt=cutoff) | Q(finished_at__isnull=True, created_at__lt=cutoff),
+        status='finished',
+    )
+
+
+def archive_batch(cutoff, batch_size=500):
+    """
+    Moves up to `batch_size` archivable sessions, oldest first, into
+    ArchivedSession and deletes their quiz, questions, choices, participant
+    rows and results. Returns the number archived.
+
+    Each batch is one transaction, so an interrupted run leaves every session
+    either fully archived or untouched and simply resumes on the next call.
+    """
+    with transaction.atomic():
+        sessions = list(
+            archivable_sessions(cutoff).select_related('quiz').order_by('id')[:batch_size]
+        )
+        if not sessions:
+            return 0
+        session_ids = [session.pk for session in sessions]
+        quiz_ids = [session.quiz_id for session in sessions]
+
+        results = defaultdict(list)
+        for row in QuizResult.objects.filter(quiz_id__in=quiz_ids).order_by('id').values_list(
+            'quiz_id', 'user_id', 'score', 'total_questions', 'completed_at'
+        ):
+            quiz_id, user_id, score, total, completed_at = row
+            results[quiz_id].append([user_id, score, total, int(completed_at.timestamp())])
+        question_counts = dict(
+            Question.objects.filter(quiz_id__in=quiz_ids).values('quiz_id')
+            .annotate(count=Count('id')).values_list('quiz_id', 'count')
+        )
+        participant_counts = dict(
+            SessionParticipant.objects.filter(session_id__in=session_ids).values('session_id')
+            .annotate(count=Count('id')).values_list('session_id', 'count')
+        )
+        ArchivedSession.objects.bulk_create([
+            ArchivedSession(
+                session_id=session.pk,
+                quiz_title=session.quiz.title,
+                room_code=session.room_code,
+                host_id=session.host_id,
+                question_count=question_counts.get(session.quiz_id, 0),
+                participant_count=participant_counts.get(session.pk, 0),
+                results=results[session.quiz_id],
+                created_at=session.created_at,
+                started_at=session.started_at,
+                finished_at=session.finished_at,
+            )
+            for session in sessions
+        ])
+
+        # Children first. While archiving, the model signals leave PlayerScore
+        # alone (archived results keep counting) and skip the per-row cache
+        # invalidation, done once per quiz below.
+        token = _archiving.set(True)
+        try:
+            for queryset in (
+                SessionParticipant.objects.filter(session_id__in=session_ids),
+                QuizResult.objects.filter(quiz_id__in=quiz_ids),
+                Choice.objects.filter(question__quiz_id__in=quiz_ids),
+                Question.objects.filter(quiz_id__in=quiz_ids),
+                QuizSession.objects.filter(pk__in=session_ids),
+                Quiz.objects.filter(pk__in=quiz_ids),
+            ):
+                queryset.delete()
+        finally:
+            _archiving.reset(token)
+
+    for quiz_id in quiz_ids:
+        invalidate_answer_key(quiz_id)
+        invalidate_quiz_body(quiz_id)
+    return len(sessions)
+
+
+def archived_results():
+    """
+    Yields (user id, score, total questions, quiz title) for every archived result.
+    """
+    for quiz_title, results in ArchivedSession.objects.values_list('quiz_title', 'results').iterator():
+        for user_id, score, total_questions, _ in results:
+            yield user_id, score, total_questions, quiz_title
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A small thread-safe, process-local LRU cache.
+
+    Every entry has a weight (1 by default, or whatever `sizeof` returns for
+    the value) and the least recently used entries are evicted once the total
+    weight goes over `maxsize`.
+    """
+
+    def __init__(self, maxsize=1024, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.currsize = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _weigh(self, value):
+        return self.sizeof(value) if self.sizeof else 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        weight = self._weigh(value)
+        with self._lock:
+            if key in self._data:
+                self.currsize -= self._weigh(self._data.pop(key))
+            if weight > self.maxsize:
+                return
+            self._data[key] = value
+            self.currsize += weight
+            while self.currsize > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.currsize -= self._weigh(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self.currsize -= self._weigh(self._data.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currsize = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,40 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .events import session_group_name
+from .models import QuizSession
+
+
+class LobbyConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes lobby events (joins, status changes) to the members of a session,
+    replacing the need to poll the status endpoint.
+    """
+
+    async def connect(self):
+        self.session_id = self.scope['url_route']['kwargs']['pk']
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or not await self.is_member(user):
+            await self.close(code=4403)
+            return
+        self.group_name = session_group_name(self.session_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # The channel is push-only; state changes go through the REST endpoints.
+        pass
+
+    async def session_event(self, message):
+        await self.send_json({key: value for key, value in message.items() if key != 'type'})
+
+    @database_sync_to_async
+    def is_member(self, user):
+        return (
+            QuizSession.objects.filter(pk=self.session_id, host=user).exists()
+            or QuizSession.objects.filter(pk=self.session_id, participants=user).exists()
+        )
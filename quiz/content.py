@@ -0,0 +1,73 @@
+from django.conf import settings
+
+from .cache import LRUCache
+from .join_queue import join_queue
+from .models import Quiz, QuizSession
+from .renderers import FastJSONRenderer, JSONFragment, JSONRenderer
+
+# Rendered quiz bodies (questions and choices) keyed by quiz id, bounded by
+# their total size in bytes.
+_quiz_bodies = LRUCache(maxsize=getattr(settings, 'QUIZ_CONTENT_CACHE_BYTES', 64 * 1024 * 1024), sizeof=len)
+
+# Rendered lobbies (QuizSessionSerializer output) with their ETag, keyed by
+# session id. Every long-poll waiter woken by the same change gets the body
+# rendered once.
+_lobby_bodies = LRUCache(maxsize=getattr(settings, 'QUIZ_LOBBY_CACHE_SIZE', 1024))
+
+
+def render_quiz_body(quiz_id):
+    from .serializers import QuizDetailSerializer
+
+    quiz = Quiz.objects.prefetch_related('questions__choices').get(pk=quiz_id)
+    return JSONRenderer().render(QuizDetailSerializer(quiz).data)
+
+
+def quiz_body(quiz_id):
+    """
+    Returns the quiz's QuizDetailSerializer output as a JSONFragment,
+    rendering it only the first time.
+    """
+    body = _quiz_bodies.get(quiz_id)
+    if body is None:
+        body = render_quiz_body(quiz_id)
+        _quiz_bodies.set(quiz_id, body)
+    return JSONFragment(body)
+
+
+def invalidate_quiz_body(quiz_id):
+    _quiz_bodies.delete(quiz_id)
+
+
+def lobby_etag(session_id):
+    """
+    The lobby's current ETag (see QuizSession.make_etag), or None if the session is gone.
+    """
+    version = QuizSession.objects.filter(pk=session_id).values_list('version', flat=True).first()
+    if version is None:
+        return None
+    return QuizSession.make_etag(session_id, version, join_queue.pending_count(session_id))
+
+
+def lobby_body(session_id):
+    """
+    Returns the rendered lobby and its ETag, costing one query while the
+    lobby is unchanged, or (None, None) if the session is gone.
+    """
+    etag = lobby_etag(session_id)
+    if etag is None:
+        return None, None
+    cached = _lobby_bodies.get(session_id)
+    if cached is not None and cached[0] == etag:
+        return cached[1], etag
+    from .serializers import QuizSessionSerializer
+
+    session = QuizSession.objects.for_detail().get(pk=session_id)
+    etag = QuizSession.make_etag(session_id, session.version, join_queue.pending_count(session_id))
+    body = FastJSONRenderer().render(QuizSessionSerializer(session).data)
+    _lobby_bodies.set(session_id, (etag, body))
+    return body, etag
+
+
+def invalidate_lobby_body(session_id):
+    _lobby_bodies.delete(session_id)
+
@@ -0,0 +1,235 @@
+import bisect
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .events import broadcast_session_event
+from .join_queue import join_queue
+from .leaderboard import record_results
+from .models import Question, QuizResult, QuizSession, SessionParticipant
+from .room_codes import forget_open_lobby, release_room_code
+from .scheduler import question_scheduler
+from .scoring import get_answer_key
+from .state import get_state_backend
+
+
+class AnswerRejected(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    """
+    The session is not in the state the requested change starts from.
+    """
+
+
+class LiveGame:
+    """
+    One in-progress session: the question order, the answer key and when
+    each question closes, held in memory, plus every participant's answers
+    and running score, held in the session-state backend (see quiz.state)
+    so players served by different worker processes share them. Answers
+    are checked and scored without touching the database; results are
+    written in one batch when the session finishes.
+    """
+
+    def __init__(self, session_id, quiz_id, started_at, questions, answer_key, participant_ids, state=None):
+        self.session_id = session_id
+        self.quiz_id = quiz_id
+        self.answer_key = answer_key
+        self.participant_ids = set(participant_ids)
+        self.question_ids = [question_id for question_id, _ in questions]
+        self.question_index = {question_id: i for i, question_id in enumerate(self.question_ids)}
+        # deadlines[i] is when question i closes, in epoch seconds.
+        self.deadlines = []
+        deadline = started_at.timestamp()
+        for _, time_limit in questions:
+            deadline += time_limit
+            self.deadlines.append(deadline)
+        self.state = state or get_state_backend()
+        # Keyed by start time too, so a restarted session never sees old answers.
+        prefix = f'game:{session_id}:{int(started_at.timestamp() * 1e6)}'
+        self.scores_key = f'{prefix}:scores'      # user id -> running score
+        self.answered_key = f'{prefix}:answered'  # "user id:question id" -> 1 if correct
+        self.submitted_key = f'{prefix}:submitted'  # users whose QuizResult was already written by `submit`
+
+    @classmethod
+    def load(cls, session):
+        """
+        Builds the game for a started session (two queries, plus one for the
+        answer key if it is not cached).
+        """
+        questions = list(
+            Question.objects.filter(quiz_id=session.quiz_id).order_by('id').values_list('id', 'time_limit')
+        )
+        participant_ids = SessionParticipant.objects.filter(session_id=session.pk).values_list('user_id', flat=True)
+        return cls(
+            session.pk, session.quiz_id, session.started_at, questions,
+            get_answer_key(session.quiz_id), participant_ids,
+        )
+
+    @property
+    def total_questions(self):
+        return len(self.question_ids)
+
+    def current_index(self, now=None):
+        """
+        Index of the question open at `now`; equals total_questions once the
+        last question has closed.
+        """
+        now = timezone.now().timestamp() if now is None else now
+        return bisect.bisect_right(self.deadlines, now)
+
+    def is_over(self, now=None):
+        return self.current_index(now) >= self.total_questions
+
+    def answer(self, user_id, question_id, choice_id, now=None):
+        """
+        Records one answer to the open question and returns whether it was correct.
+        """
+        index = self.question_index.get(question_id)
+        if user_id not in self.participant_ids:
+            raise AnswerRejected('You are not a participant in this session.')
+        if index is None:
+            raise AnswerRejected('This question is not part of the quiz.')
+        if index != self.current_index(now):
+            raise AnswerRejected('This question is not open for answers.')
+        correct = choice_id in self.answer_key.correct_choices.get(question_id, ())
+        if not self.state.hash_set_new(self.answered_key, f'{user_id}:{question_id}', int(correct)):
+            raise AnswerRejected('This question has already been answered.')
+        self.state.hash_incr(self.scores_key, user_id, int(correct))
+        return correct
+
+    def score_of(self, user_id):
+        return int(self.state.hash_get(self.scores_key, user_id) or 0)
+
+    def mark_submitted(self, user_id):
+        self.state.set_add(self.submitted_key, user_id)
+
+    def persist_results(self):
+        """
+        Writes a QuizResult for every player who answered live, in one batch.
+        """
+        submitted = self.state.set_members(self.submitted_key)
+        scores = {
+            int(user_id): int(score)
+            for user_id, score in self.state.hash_get_all(self.scores_key).items() if user_id not in submitted
+        }
+        results = QuizResult.objects.bulk_create([
+            QuizResult(user_id=user_id, quiz_id=self.quiz_id, score=score, total_questions=self.total_questions)
+            for user_id, score in scores.items()
+        ])
+        record_results(results)
+
+    def clear(self):
+        self.state.delete(self.scores_key, self.answered_key, self.submitted_key)
+
+
+class GameRegistry:
+    """
+    The live games of this process, keyed by session id.
+    """
+
+    def __init__(self):
+        self._games = {}
+        self._lock = threading.Lock()
+
+    def get(self, session):
+        """
+        Returns the live game of an in-progress session, loading it if it was
+        started by another process or before a restart.
+        """
+        game = self._games.get(session.pk)
+        if session.status != 'in_progress':
+            # Finished by another worker process.
+            if game is not None:
+                self.pop(session.pk)
+            return None
+        if game is None and session.started_at is not None:
+            with self._lock:
+                game = self._games.get(session.pk)
+                if game is None:
+                    game = self._games[session.pk] = LiveGame.load(session)
+                    if getattr(settings, 'QUIZ_QUESTION_SCHEDULER', True):
+                        # Covers for the starting worker if it has gone away.
+                        question_scheduler.adopt_game(game)
+        return game
+
+    def find(self, session_id):
+        """
+        Returns the game if this process holds it, without loading.
+        """
+        return self._games.get(session_id)
+
+    def start(self, session):
+        game = LiveGame.load(session)
+        with self._lock:
+            self._games[session.pk] = game
+        return game
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._games.pop(session_id, None)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._games.values()))
+
+
+games = GameRegistry()
+
+
+def start_session(session):
+    """
+    Closes the lobby and starts the game. Raises InvalidTransition unless
+    the session is still in the lobby.
+    """
+    # Write any batched joins before the lobby closes.
+    join_queue.forget(session.pk)
+    started_at = timezone.now()
+    with transaction.atomic():
+        # Conditional, so only one of several racing starts wins.
+        if not QuizSession.objects.filter(pk=session.pk, status='lobby').update(
+            status='in_progress', started_at=started_at
+        ):
+            raise InvalidTransition('The quiz has already started.')
+        session.bump_version()
+    session.status = 'in_progress'
+    session.started_at = started_at
+    forget_open_lobby(session.room_code)
+    game = games.start(session)
+    if getattr(settings, 'QUIZ_QUESTION_SCHEDULER', True):
+        question_scheduler.schedule_game(game)
+    broadcast_session_event(session.pk, 'status_changed', status=session.status)
+
+
+def finish_session(session):
+    """
+    Ends the game, writes the live results and frees the room code. Raises
+    InvalidTransition unless the session is in progress.
+    """
+    join_queue.forget(session.pk)
+    # Loaded from the shared state if another worker (or this one before a
+    # restart) started the game.
+    game = games.get(session)
+    finished_at = timezone.now()
+    with transaction.atomic():
+        if not QuizSession.objects.filter(pk=session.pk, status='in_progress').update(
+            status='finished', finished_at=finished_at
+        ):
+            raise InvalidTransition('The quiz is not in progress.')
+        session.bump_version()
+        if game is not None:
+            game.persist_results()
+        release_room_code(session.room_code)
+    # Only once committed: a failed transaction leaves the game playable.
+    games.pop(session.pk)
+    session.status = 'finished'
+    session.finished_at = finished_at
+    if game is not None:
+        game.clear()
+    question_scheduler.forget(session.pk)
+    forget_open_lobby(session.room_code)
+    broadcast_session_event(session.pk, 'status_changed', status=session.status)
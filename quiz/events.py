@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def session_group_name(session_id):
+    return f'quiz_session_{session_id}'
+
+
+class SessionWaiters:
+    """
+    One asyncio event per session with long-poll requests parked on it
+    (see lobby_status_wait). notify() wakes every waiter of a session from
+    any thread, and the next listener gets a fresh event. Sessions nobody
+    is waiting on cost nothing.
+
+    In-process only: with several workers, a change made by another worker
+    is picked up when the waiter's timeout runs out.
+    """
+
+    def __init__(self):
+        self._events = {}  # session id -> [loop, event, listeners]
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def listen(self, session_id):
+        """
+        Yields an asyncio.Event that is set at the next change to the
+        session. Listen before reading the state, so no change is missed.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._events.get(session_id)
+            if entry is None or entry[0] is not loop:
+                entry = self._events[session_id] = [loop, asyncio.Event(), 0]
+            entry[2] += 1
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                entry[2] -= 1
+                if entry[2] == 0 and self._events.get(session_id) is entry:
+                    del self._events[session_id]
+
+    def notify(self, session_id):
+        with self._lock:
+            entry = self._events.pop(session_id, None)
+        if entry is not None and not entry[0].is_closed():
+            entry[0].call_soon_threadsafe(entry[1].set)
+
+    def __len__(self):
+        return len(self._events)
+
+
+session_waiters = SessionWaiters()
+
+
+def broadcast_session_event(session_id, event, **data):
+    """
+    Fans a single lobby event out to every socket subscribed to the session,
+    and wakes the session's long-poll waiters. Both happen once the
+    surrounding transaction commits, so clients never hear about state they
+    cannot read back yet.
+    """
+    channel_layer = get_channel_layer()
+    message = {'type': 'session.event', 'event': event, **data}
+
+    def send():
+        session_waiters.notify(int(session_id))
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(session_group_name(session_id), message)
+
+    transaction.on_commit(send)
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from quiz_backend.sqlite import write_lock
+
+from .models import QuizSession, SessionParticipant
+from .state import get_state_backend
+
+logger = logging.getLogger(__name__)
+
+
+class JoinQueue:
+    """
+    Coalesces lobby joins into batched inserts.
+
+    Each session gets a roster of its participants in the session-state
+    backend (see quiz.state), so every worker process sees the same lobby.
+    A join is acknowledged as soon as the user is on the roster; the
+    through-table rows are written by a background thread with one bulk
+    insert per session every `interval` seconds, which also bumps the
+    session version once per batch. Until then, pending users are merged
+    into session responses from here.
+    """
+
+    PENDING_SESSIONS = 'lobby:pending'
+
+    def __init__(self, enabled=False, interval=0.2, state=None):
+        self.enabled = enabled
+        self.interval = interval
+        self._state = state
+        self._loaded = set()  # sessions whose roster this process has seen loaded
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    @property
+    def state(self):
+        return self._state or get_state_backend()
+
+    @staticmethod
+    def _keys(session_id):
+        return f'lobby:{session_id}:roster', f'lobby:{session_id}:pending', f'lobby:{session_id}:meta'
+
+    def _load_roster(self, session_id):
+        if session_id in self._loaded:
+            return
+        roster_key, _, meta_key = self._keys(session_id)
+        # The first process to claim the roster copies the participants in from the database.
+        if self.state.hash_set_new(meta_key, 'roster_loaded', 1):
+            user_ids = SessionParticipant.objects.filter(session_id=session_id).values_list('user_id', flat=True)
+            self.state.set_add(roster_key, *user_ids)
+        self._loaded.add(session_id)
+
+    def add(self, session_id, user):
+        """
+        Puts a user on the session's roster. Returns False if they already were.
+        """
+        roster_key, pending_key, _ = self._keys(session_id)
+        self._load_roster(session_id)
+        if not self.state.set_add(roster_key, user.pk):
+            return False
+        # Prefixed with the join time so pending users are listed in join order.
+        self.state.hash_update(pending_key, {user.pk: f'{time.time():.6f}:{user.username}'})
+        self.state.set_add(self.PENDING_SESSIONS, session_id)
+        self._ensure_flusher()
+        return True
+
+    def pending(self, session_id):
+        """
+        Returns the usernames that joined but are not written to the database yet.
+        """
+        if not self.enabled:
+            return []
+        _, pending_key, _ = self._keys(session_id)
+        return [value.split(':', 1)[1] for value in sorted(self.state.hash_get_all(pending_key).values())]
+
+    def pending_count(self, session_id):
+        if not self.enabled:
+            return 0
+        return self.state.hash_len(self._keys(session_id)[1])
+
+    def flush(self, session_id=None):
+        """
+        Writes pending joins for one session, or for every session.
+        """
+        if session_id is None:
+            session_ids = [int(member) for member in self.state.set_members(self.PENDING_SESSIONS)]
+        else:
+            session_ids = [session_id]
+        for batch_session_id in session_ids:
+            _, pending_key, _ = self._keys(batch_session_id)
+            # Unlisted before the batch is taken, so a join racing with the
+            # flush lists the session again instead of being missed.
+            self.state.set_remove(self.PENDING_SESSIONS, batch_session_id)
+            users = self.state.hash_pop_all(pending_key)
+            if not users:
+                continue
+            try:
+                with write_lock(), transaction.atomic():
+                    version = QuizSession(pk=batch_session_id).bump_version()
+                    SessionParticipant.objects.bulk_create(
+                        [SessionParticipant(session_id=batch_session_id, user_id=int(user_id), joined_version=version)
+                         for user_id in users],
+                        ignore_conflicts=True,
+                    )
+            except Exception:
+                # Put the batch back so the next flush retries it.
+                self.state.hash_update(pending_key, users)
+                self.state.set_add(self.PENDING_SESSIONS, batch_session_id)
+                raise
+
+    def forget(self, session_id):
+        """
+        Flushes and drops a session's roster once its lobby closes.
+        """
+        if not self.enabled:
+            return
+        self.flush(session_id)
+        roster_key, _, meta_key = self._keys(session_id)
+        self.state.delete(roster_key, meta_key)
+        self._loaded.discard(session_id)
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._run, name='quiz-join-flusher', daemon=True)
+                    self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing batched lobby joins failed")
+            finally:
+                close_old_connections()
+
+
+join_queue = JoinQueue(
+    enabled=getattr(settings, 'QUIZ_JOIN_BATCHING', False),
+    interval=getattr(settings, 'QUIZ_JOIN_FLUSH_MS', 200) / 1000,
+)
@@ -0,0 +1,164 @@
+import threading
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Subquery, Value, When
+
+from quiz_backend.sqlite import write_lock
+
+from .archive import archived_results
+from .models import ArchivedSession, PlayerScore, Quiz, QuizResult, result_percentage
+
+LEADERBOARD_SIZE = 10
+STAT_FIELDS = [
+    'total_score', 'quizzes_played', 'total_questions', 'percentage_sum',
+    'best_percentage', 'best_score', 'best_total_questions', 'best_quiz_title',
+]
+
+
+class TopScores:
+    """
+    Process-local copy of the top-K rows of the PlayerScore index.
+
+    Writes from this process are applied immediately; the copy is re-read
+    from the index every `max_age` seconds to pick up other workers' writes.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE, max_age=None):
+        self.size = size
+        self.max_age = max_age if max_age is not None else getattr(settings, 'QUIZ_LEADERBOARD_MAX_AGE', 5)
+        self._entries = None  # user id -> (total_score, username)
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        rows = PlayerScore.objects.select_related('user').order_by('-total_score', 'user_id')[:self.size]
+        self._entries = {row.user_id: (row.total_score, row.user.username) for row in rows}
+        self._loaded_at = time.monotonic()
+
+    def _ranked(self):
+        return sorted(self._entries.items(), key=lambda item: (-item[1][0], item[0]))
+
+    def top(self):
+        """
+        Returns the leaderboard as a list of {'username', 'total_score'} dicts.
+        """
+        with self._lock:
+            if self._entries is None or time.monotonic() - self._loaded_at > self.max_age:
+                self._load()
+            return [
+                {'username': username, 'total_score': total}
+                for _, (total, username) in self._ranked()
+            ]
+
+    def record(self, user_id, username, total_score):
+        """
+        Applies a user's new total to the in-memory top-K.
+        """
+        with self._lock:
+            if self._entries is None:
+                return
+            self._entries[user_id] = (total_score, username)
+            if len(self._entries) > self.size:
+                self._entries = dict(self._ranked()[:self.size])
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+
+top_scores = TopScores()
+
+
+def record_result(result):
+    """
+    Applies a new QuizResult to its user's PlayerScore in one UPDATE. Must be
+    called inside the transaction that creates the result so both commit
+    together.
+    """
+    percentage = result_percentage(result.score, result.total_questions)
+    is_best = Q(best_percentage__isnull=True) | Q(best_percentage__lt=percentage)
+
+    def if_best(value, field):
+        return Case(When(is_best, then=value), default=F(field))
+
+    updates = {
+        'total_score': F('total_score') + result.score,
+        'quizzes_played': F('quizzes_played') + 1,
+        'total_questions': F('total_questions') + result.total_questions,
+        'percentage_sum': F('percentage_sum') + percentage,
+        'best_percentage': if_best(Value(percentage), 'best_percentage'),
+        'best_score': if_best(Value(result.score), 'best_score'),
+        'best_total_questions': if_best(Value(result.total_questions), 'best_total_questions'),
+        'best_quiz_title': if_best(
+            Subquery(Quiz.objects.filter(pk=result.quiz_id).values('title')[:1]), 'best_quiz_title'
+        ),
+    }
+    scores = PlayerScore.objects.filter(user_id=result.user_id)
+    # Returning players (the common case) cost an UPDATE and a read-back.
+    if not scores.update(**updates):
+        PlayerScore.objects.bulk_create([PlayerScore(user_id=result.user_id)], ignore_conflicts=True)
+        scores.update(**updates)
+    total = scores.values_list('total_score', flat=True).get()
+    user = result.user
+    transaction.on_commit(lambda: top_scores.record(user.pk, user.username, total))
+    return total
+
+
+def rebuild_player_scores():
+    """
+    Recomputes every PlayerScore row from QuizResult and the results of
+    archived sessions, in one transaction that keeps results from being
+    recorded or archived between the read and the write.
+    """
+    with write_lock(), transaction.atomic():
+        # On SQLite the delete takes the database write lock up front, so
+        # the reads below see every result until commit. PostgreSQL needs
+        # the result tables locked against writers explicitly.
+        PlayerScore.objects.all().delete()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {QuizResult._meta.db_table}, {ArchivedSession._meta.db_table} IN SHARE MODE'
+                )
+        rows = {}
+        live_results = QuizResult.objects.order_by('id').values_list(
+            'user_id', 'score', 'total_questions', 'quiz__title'
+        ).iterator()
+        for user_id, score, total_questions, quiz_title in chain(archived_results(), live_results):
+            row = rows.get(user_id)
+            if row is None:
+                row = rows[user_id] = PlayerScore(user_id=user_id)
+            row.add_result(score, total_questions, quiz_title)
+        PlayerScore.objects.bulk_create(rows.values(), batch_size=1000)
+    top_scores.invalidate()
+
+
+def record_results(results):
+    """
+    Batch version of record_result, used when a live game persists all of
+    its results at once (bulk inserts skip signals).
+    """
+    if not results:
+        return
+    titles = dict(Quiz.objects.filter(pk__in={r.quiz_id for r in results}).values_list('id', 'title'))
+    PlayerScore.objects.bulk_create(
+        [PlayerScore(user_id=result.user_id) for result in results], ignore_conflicts=True
+    )
+    rows = {
+        row.user_id: row
+        for row in PlayerScore.objects.select_for_update().select_related('user').filter(
+            user_id__in=[result.user_id for result in results]
+        )
+    }
+    for result in results:
+        rows[result.user_id].add_result(result.score, result.total_questions, titles.get(result.quiz_id, ''))
+    PlayerScore.objects.bulk_update(rows.values(), STAT_FIELDS)
+
+    def record():
+        for row in rows.values():
+            top_scores.record(row.user_id, row.user.username, row.total_score)
+
+    transaction.on_commit(record)
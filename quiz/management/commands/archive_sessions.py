@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from quiz.archive import archive_batch, archive_cutoff, archivable_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves finished sessions older than the retention window into the "
+        "compact ArchivedSession table. Safe to interrupt and re-run; meant to "
+        "be scheduled (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Retention window (default QUIZ_ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None, help="Stop after this many batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the sessions that would be archived.")
+
+    def handle(self, days, batch_size, max_batches, dry_run, **options):
+        cutoff = archive_cutoff(days)
+        if dry_run:
+            count = archivable_sessions(cutoff).count()
+            self.stdout.write(f"{count} finished sessions older than {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = archive_batch(cutoff, batch_size)
+            archived += count
+            batches += 1
+            if count:
+                self.stdout.write(f"Batch {batches}: archived {count} sessions.")
+            if count < batch_size:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} sessions."))
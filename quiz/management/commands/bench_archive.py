@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from quiz.archive import archive_batch
+from quiz.models import (
+    ArchivedSession, Choice, Question, Quiz, QuizResult, QuizSession, SessionParticipant,
+)
+from quiz.room_codes import _block, _open_lobbies, encode, permute
+from quiz_backend.benchmarks import percentiles, us
+
+HOT_TABLES = (Quiz, Question, Choice, QuizSession, SessionParticipant, QuizResult)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the live tables with old finished sessions, measures join/status "
+        "latency and table sizes, archives them and measures again. Everything "
+        "runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--finished', type=int, default=20_000, help="Old finished sessions to create.")
+        parser.add_argument('--players', type=int, default=10, help="Participants (and results) per session.")
+        parser.add_argument('--questions', type=int, default=5)
+        parser.add_argument('--lobbies', type=int, default=100, help="Open lobbies the requests hit.")
+        parser.add_argument('--requests', type=int, default=1_000, help="Timed join and status requests per phase.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            _block.reset()
+            _open_lobbies.clear()
+
+    def run(self, finished, players, questions, lobbies, requests, batch_size, **options):
+        User = get_user_model()
+        start = time.perf_counter()
+        users = User.objects.bulk_create([
+            User(username=f'bench_archive_{i}', email=f'bench_archive_{i}@example.com')
+            for i in range(players + requests)
+        ])
+        host, players_, joiners = users[0], users[:players], users[players:]
+        self.create_sessions(host, players_, finished, questions, status='finished', offset=0)
+        long_ago = timezone.now() - timedelta(days=365)
+        QuizSession.objects.filter(status='finished').update(created_at=long_ago, finished_at=long_ago)
+        self.lobbies = self.create_sessions(host, players_, lobbies, questions, status='lobby', offset=finished)
+        self.stdout.write(f"Set up {finished} finished sessions in {time.perf_counter() - start:.1f}s")
+
+        self.report('before', joiners, requests)
+        start = time.perf_counter()
+        archived = 0
+        while count := archive_batch(timezone.now(), batch_size):
+            archived += count
+        self.stdout.write(
+            f"Archived {archived} sessions in {time.perf_counter() - start:.1f}s "
+            f"({ArchivedSession.objects.count()} archive rows)"
+        )
+        self.report('after', joiners, requests)
+
+    def create_sessions(self, host, players, count, questions, status, offset, chunk=1_000):
+        sessions = []
+        for first in range(0, count, chunk):
+            values = range(offset + first, offset + min(first + chunk, count))
+            quizzes = Quiz.objects.bulk_create(
+                [Quiz(title='bench', owner=host, room_code=encode(permute(v))) for v in values]
+            )
+            question_rows = Question.objects.bulk_create(
+                [Question(quiz=quiz, text='Q') for quiz in quizzes for _ in range(questions)]
+            )
+            Choice.objects.bulk_create(
+                [Choice(question=q, text='C', is_correct=i == 0) for q in question_rows for i in range(4)]
+            )
+            created = QuizSession.objects.bulk_create(
+                [QuizSession(quiz=q, host=host, room_code=q.room_code, status=status) for q in quizzes]
+            )
+            SessionParticipant.objects.bulk_create(
+                [SessionParticipant(session=s, user=user) for s in created for user in players]
+            )
+            if status == 'finished':
+                QuizResult.objects.bulk_create([
+                    QuizResult(quiz_id=s.quiz_id, user=user, score=1, total_questions=questions)
+                    for s in created for user in players
+                ])
+            sessions += created
+        return sessions
+
+    def report(self, phase, joiners, requests):
+        sizes = ', '.join(f"{model.__name__} {model.objects.count()}" for model in HOT_TABLES)
+        self.stdout.write(f"[{phase}] rows: {sizes}")
+        client = APIClient()
+        client.force_authenticate(self.lobbies[0].host)
+        for lobby in self.lobbies:
+            # Warm the quiz body and lobby caches so both phases start alike.
+            client.get(f'/api/quiz-sessions/{lobby.pk}/status/')
+        joins, polls = [], []
+        for user in joiners:
+            lobby = random.choice(self.lobbies)
+            client.force_authenticate(user)
+            t0 = time.perf_counter()
+            client.post('/api/quiz-sessions/join/', {'room_code': lobby.room_code}, format='json')
+            joins.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            client.get(f'/api/quiz-sessions/{lobby.pk}/status/')
+            polls.append(time.perf_counter() - t0)
+        for name, timings in (('join', joins), ('status', polls)):
+            timings.sort()
+            self.stdout.write(
+                f"[{phase}] {name} x{requests}: mean {us(statistics.mean(timings))}, {percentiles(timings, us)}"
+            )
+        # Leave the lobbies as they were so both phases serve the same rosters.
+        SessionParticipant.objects.filter(user__in=joiners).delete()
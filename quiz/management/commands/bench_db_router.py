@@ -0,0 +1,112 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from quiz.models import Choice, Question, Quiz, QuizSession, SessionParticipant
+from quiz_backend.benchmarks import percentiles, us
+from quiz_backend.db_router import pin_cache
+
+from .sync_sqlite_replica import copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures join latency while poller threads hammer the lobby status "
+        "endpoint, first with every read on the primary and then with status "
+        "reads routed to a replica. Runs on throwaway SQLite files, like the "
+        "test runner; the configured databases are not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pollers', type=int, default=8, help="Threads polling the status endpoint.")
+        parser.add_argument('--joins', type=int, default=300, help="Timed joins per phase.")
+        parser.add_argument(
+            '--rate', type=float, default=150,
+            help="Total status polls per second, so both phases put the same load on the CPU.",
+        )
+
+    def handle(self, pollers, joins, rate, **options):
+        aliases = ('default', 'replica')
+        names = {alias: connections[alias].settings_dict['NAME'] for alias in aliases}
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                for alias in aliases:
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = os.path.join(directory, f'{alias}.sqlite3')
+                call_command('migrate', database='default', verbosity=0)
+                self.run(pollers, joins, rate)
+            finally:
+                for alias in aliases:
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = names[alias]
+
+    def run(self, pollers, joins, rate):
+        User = get_user_model()
+        host = User.objects.create_user(username='bench_host', email='bench_host@example.com')
+        joiners = User.objects.bulk_create([
+            User(username=f'bench_router_{i}', email=f'bench_router_{i}@example.com') for i in range(joins)
+        ])
+        quiz = Quiz.objects.create(title='bench', owner=host)
+        for q in range(5):
+            question = Question.objects.create(quiz=quiz, text=f'Q{q}')
+            Choice.objects.bulk_create([Choice(question=question, text='C', is_correct=i == 0) for i in range(4)])
+        session = QuizSession.objects.create(quiz=quiz, host=host, room_code=quiz.room_code)
+        session.participants.add(host)
+
+        for phase, replicas in (('primary only', []), ('replica', ['replica'])):
+            SessionParticipant.objects.filter(user__in=joiners).delete()
+            connections['replica'].close()
+            copy_sqlite_database(connections['default'].settings_dict['NAME'],
+                                 connections['replica'].settings_dict['NAME'])
+            pin_cache().clear()
+            with override_settings(DATABASE_REPLICAS=replicas):
+                self.report(phase, session, host, joiners, pollers, rate)
+
+    def report(self, phase, session, host, joiners, pollers, rate):
+        status_url = f'/api/quiz-sessions/{session.pk}/status/'
+        stop = threading.Event()
+        polls = []
+
+        def poll():
+            client = APIClient()
+            client.force_authenticate(host)
+            count = 0
+            interval = pollers / rate
+            next_poll = time.perf_counter()
+            while not stop.wait(max(next_poll - time.perf_counter(), 0)):
+                client.get(status_url)
+                count += 1
+                next_poll += interval
+            polls.append(count)
+            close_old_connections()
+
+        threads = [threading.Thread(target=poll) for _ in range(pollers)]
+        for thread in threads:
+            thread.start()
+        client = APIClient()
+        timings = []
+        start = time.perf_counter()
+        for user in joiners:
+            client.force_authenticate(user)
+            t0 = time.perf_counter()
+            client.post('/api/quiz-sessions/join/', {'room_code': session.room_code}, format='json')
+            timings.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        timings.sort()
+        self.stdout.write(
+            f"[{phase}] join x{len(timings)}: mean {us(statistics.mean(timings))}, {percentiles(timings, us)}; "
+            f"{sum(polls) / elapsed:.0f} status polls/s from {pollers} threads"
+        )
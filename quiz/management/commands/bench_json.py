@@ -0,0 +1,72 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+
+from quiz.parsers import FastJSONParser
+from quiz.renderers import FastJSONRenderer, JSONRenderer
+
+
+def lobby_payload(participants, questions=20, choices=4):
+    return {
+        'id': 1,
+        'quiz': {
+            'id': 1, 'title': 'Benchmark quiz', 'description': 'A quiz used for benchmarking',
+            'questions': [
+                {
+                    'id': q, 'text': f'Question number {q} – what is the answer?', 'time_limit': 30,
+                    'choices': [{'id': q * 10 + c, 'text': f'Choice {c}'} for c in range(choices)],
+                }
+                for q in range(questions)
+            ],
+        },
+        'room_code': 'ABC123', 'status': 'lobby', 'version': participants,
+        'host': {'username': 'host'},
+        'participants': [{'username': f'player_{i}'} for i in range(participants)],
+    }
+
+
+def submit_payloads(participants, questions=20):
+    # One submit request body per participant.
+    return [{'answers': {str(q): q * 10 for q in range(questions)}} for _ in range(participants)]
+
+
+def leaderboard_payload(participants):
+    return [{'username': f'player_{i}', 'total_score': 1000 - i} for i in range(participants)]
+
+
+class Command(BaseCommand):
+    help = "Compares the standard and orjson-backed DRF renderer/parser on quiz payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000', help="Participant counts.")
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def timed(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) / repeat, result
+
+    def handle(self, sizes, repeat, **options):
+        codecs = (('stdlib', JSONRenderer(), JSONParser()), ('orjson', FastJSONRenderer(), FastJSONParser()))
+        self.stdout.write(f"{'payload':<12}{'n':>6}{'codec':>8}{'encode':>11}{'decode':>11}{'bytes':>10}")
+        for n in (int(size) for size in sizes.split(',')):
+            payloads = {
+                'lobby': [lobby_payload(n)],
+                'submit': submit_payloads(n),
+                'leaderboard': [leaderboard_payload(n)],
+            }
+            for name, items in payloads.items():
+                for codec, renderer, parser in codecs:
+                    encode, bodies = self.timed(lambda: [renderer.render(item) for item in items], repeat)
+                    decode, decoded = self.timed(
+                        lambda: [parser.parse(io.BytesIO(body)) for body in bodies], repeat
+                    )
+                    assert json.loads(bodies[0]) == decoded[0]
+                    self.stdout.write(
+                        f"{name:<12}{n:>6}{codec:>8}{encode * 1e6:>9.0f}us{decode * 1e6:>9.0f}us"
+                        f"{sum(len(body) for body in bodies):>10}"
+                    )
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from quiz.events import broadcast_session_event, session_waiters
+from quiz.models import Choice, Question, Quiz, QuizSession, SessionParticipant
+from quiz_backend.sqlite_settings import sqlite_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Parks N long-poll requests on one lobby in a single event loop, then "
+        "measures the memory they hold and how long one join takes to answer "
+        "them all, next to the cost of N clients polling `status` instead. "
+        "Runs on a throwaway SQLite file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2_000, help="Parked long-poll requests.")
+        parser.add_argument('--polls', type=int, default=500, help="Timed plain status requests.")
+
+    def handle(self, clients, polls, **options):
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict)
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                connection.close()
+                settings_dict.update(sqlite_database(os.path.join(directory, 'bench.sqlite3')))
+                call_command('migrate', verbosity=0)
+                self.run(clients, polls)
+            finally:
+                connection.close()
+                settings_dict.clear()
+                settings_dict.update(original)
+
+    def run(self, clients, polls):
+        User = get_user_model()
+        host = User.objects.create_user(username='bench_host', email='bench_host@example.com')
+        quiz = Quiz.objects.create(title='bench', owner=host)
+        for q in range(5):
+            question = Question.objects.create(quiz=quiz, text=f'Q{q}')
+            Choice.objects.bulk_create([Choice(question=question, text='C', is_correct=i == 0) for i in range(4)])
+        session = QuizSession.objects.create(quiz=quiz, host=host, room_code=quiz.room_code)
+        players = User.objects.bulk_create([
+            User(username=f'bench_poll_{i}', email=f'bench_poll_{i}@example.com') for i in range(30)
+        ])
+        SessionParticipant.objects.bulk_create([SessionParticipant(session=session, user=u) for u in [host] + players])
+        joiner = User.objects.create_user(username='bench_joiner', email='bench_joiner@example.com')
+        token = Token.objects.create(user=host)
+
+        client = APIClient()
+        client.force_authenticate(host)
+        client.get(f'/api/quiz-sessions/{session.pk}/status/')
+        start = time.perf_counter()
+        for _ in range(polls):
+            client.get(f'/api/quiz-sessions/{session.pk}/status/')
+        per_poll = (time.perf_counter() - start) / polls
+        self.stdout.write(
+            f"[polling] full status request: {per_poll * 1e3:.2f}ms; {clients} clients polling "
+            f"every second need {clients * per_poll:.2f} CPU-seconds per second"
+        )
+
+        asyncio.run(self.long_poll(session, token.key, joiner, clients))
+
+    async def long_poll(self, session, key, joiner, clients):
+        client = AsyncClient()
+        url = f'/api/quiz-sessions/{session.pk}/status/wait/'
+        first = await client.get(url, headers={'Authorization': f'Token {key}'})
+        headers = {'Authorization': f'Token {key}', 'If-None-Match': first['ETag']}
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        requests = [asyncio.ensure_future(client.get(url, {'timeout': '60'}, headers=headers)) for _ in range(clients)]
+        while session_waiters._events.get(session.pk, (None, None, 0))[2] < clients:
+            await asyncio.sleep(0.01)
+        parked = time.perf_counter() - start
+        held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+        tracemalloc.stop()
+        self.stdout.write(
+            f"[long poll] parked {clients} requests in {parked:.2f}s, "
+            f"holding {held / clients / 1024:.1f} KiB each"
+        )
+
+        def join():
+            version = session.bump_version()
+            SessionParticipant.objects.create(session=session, user=joiner, joined_version=version)
+            broadcast_session_event(session.pk, 'participant_joined', username=joiner.username)
+
+        start = time.perf_counter()
+        await sync_to_async(join)()
+        responses = await asyncio.gather(*requests)
+        woken = time.perf_counter() - start
+        ok = sum(response.status_code == 200 for response in responses)
+        self.stdout.write(
+            f"[long poll] one join answered {ok}/{clients} waiters in {woken:.2f}s "
+            f"({woken / clients * 1e3:.2f}ms each); idle clients cost nothing between changes"
+        )
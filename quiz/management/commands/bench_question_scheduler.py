@@ -0,0 +1,60 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.scheduler import QuestionScheduler
+from quiz.state import InProcessStateBackend
+from quiz_backend.benchmarks import ms, percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the question scheduler with many concurrent simulated sessions and "
+        "reports tick jitter (how late each question transition fires). The "
+        "simulated sessions are recorded in a private in-process state backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=10_000)
+        parser.add_argument('--questions', type=int, default=5)
+        parser.add_argument('--min-limit', type=float, default=1.0, help="Shortest question time limit (s).")
+        parser.add_argument('--max-limit', type=float, default=3.0, help="Longest question time limit (s).")
+        parser.add_argument('--tick-ms', type=int, default=100)
+
+    def handle(self, sessions, questions, min_limit, max_limit, tick_ms, **options):
+        lateness = []
+        remaining = {'count': sessions}
+        done = threading.Event()
+
+        def on_expire(scheduler, session_id, question_index, deadline):
+            # Stands in for advance_game without the database or channel layer.
+            lateness.append(time.time() - deadline)
+            if question_index + 1 < questions:
+                scheduler.schedule(
+                    deadline + random.uniform(min_limit, max_limit), session_id, question_index + 1
+                )
+            else:
+                scheduler.forget(session_id)
+                remaining['count'] -= 1
+                if remaining['count'] == 0:
+                    done.set()
+
+        scheduler = QuestionScheduler(tick=tick_ms / 1000, on_expire=on_expire, state=InProcessStateBackend())
+        start = time.time()
+        for session_id in range(sessions):
+            # Stagger game starts over the first second.
+            scheduler.schedule(start + random.random() + random.uniform(min_limit, max_limit), session_id, 0)
+        setup = time.time() - start
+
+        done.wait()
+        elapsed = time.time() - start
+        lateness.sort()
+        self.stdout.write(
+            f"{sessions} sessions x {questions} questions, tick {tick_ms}ms: "
+            f"{len(lateness)} transitions in {elapsed:.1f}s (scheduling took {ms(setup)})"
+        )
+        self.stdout.write(
+            f"lateness {percentiles(lateness)}, max {ms(lateness[-1])}"
+        )
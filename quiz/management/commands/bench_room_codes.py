@@ -0,0 +1,76 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from quiz.models import Quiz, QuizSession, ReleasedRoomCode, RoomCodeSequence
+from quiz.room_codes import _block, allocate_room_code, encode, permute
+from quiz_backend.benchmarks import percentiles, us
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks room code allocation latency with many codes already in use. "
+        "Everything runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--in-use', type=int, default=1_000_000, help="Active sessions to create first.")
+        parser.add_argument('--released', type=int, default=1_000, help="Recycled codes waiting in the pool.")
+        parser.add_argument('--allocations', type=int, default=10_000, help="Codes to allocate and time.")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            _block.reset()
+
+    def run(self, in_use, released, allocations, batch_size, **options):
+        host, _ = get_user_model().objects.get_or_create(
+            username='bench_room_codes', defaults={'email': 'bench_room_codes@example.com'}
+        )
+        start = time.perf_counter()
+        for offset in range(0, in_use, batch_size):
+            values = range(offset, min(offset + batch_size, in_use))
+            quizzes = Quiz.objects.bulk_create(
+                [Quiz(title='bench', owner=host, room_code=encode(permute(v))) for v in values]
+            )
+            QuizSession.objects.bulk_create(
+                [QuizSession(quiz=q, host=host, room_code=q.room_code) for q in quizzes]
+            )
+        RoomCodeSequence.objects.update_or_create(pk=1, defaults={'next_value': in_use})
+        released_at = timezone.now() - timedelta(days=1)
+        ReleasedRoomCode.objects.bulk_create(
+            [ReleasedRoomCode(code=encode(permute(in_use + allocations + v))) for v in range(released)]
+        )
+        ReleasedRoomCode.objects.update(released_at=released_at)
+        _block.reset()
+        self.stdout.write(f"Set up {in_use} active sessions in {time.perf_counter() - start:.1f}s")
+
+        timings = []
+        codes = set()
+        for _ in range(allocations):
+            t0 = time.perf_counter()
+            codes.add(allocate_room_code())
+            timings.append(time.perf_counter() - t0)
+
+        if len(codes) != allocations:
+            self.stderr.write(self.style.ERROR(f"Duplicate codes: {allocations - len(codes)}"))
+        timings.sort()
+        self.stdout.write(
+            f"{allocations} allocations ({min(released, allocations)} recycled): "
+            f"mean {us(statistics.mean(timings))}, {percentiles(timings, us)}, max {us(timings[-1])}"
+        )
@@ -0,0 +1,118 @@
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from quiz.models import Choice, Question, Quiz, QuizSession
+from quiz_backend.benchmarks import ms, percentiles
+from quiz_backend.sqlite_settings import sqlite_database
+
+from .sync_sqlite_replica import copy_sqlite_database
+
+PROFILES = (
+    # name, DATABASES entry for a file, settings
+    ('plain', lambda name: {'NAME': name, 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+     {'SQLITE_WRITE_QUEUE': False, 'SQLITE_BUSY_RETRIES': 0}),
+    ('production', sqlite_database, {'SQLITE_WRITE_QUEUE': True, 'SQLITE_BUSY_RETRIES': 3}),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs N client threads that each join lobbies and submit results as "
+        "fast as they can, against a throwaway SQLite file: once with Django's "
+        "default SQLite settings and once with the production profile "
+        "(quiz_backend.sqlite). Reports write throughput, latency and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help="Simultaneous client threads.")
+        parser.add_argument('--lobbies', type=int, default=20, help="Lobbies each client joins (and submits to).")
+
+    def handle(self, clients, lobbies, **options):
+        # Failed writes are counted in the report; their tracebacks would drown it.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        logging.getLogger('quiz_backend.sqlite').setLevel(logging.ERROR)
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict)
+        with tempfile.TemporaryDirectory() as directory:
+            template = os.path.join(directory, 'template.sqlite3')
+            try:
+                connection.close()
+                # Built with the plain profile, so the template is not in WAL mode yet.
+                settings_dict.update(PROFILES[0][1](template))
+                call_command('migrate', verbosity=0)
+                sessions, users = self.populate(clients, lobbies)
+                for name, database, overrides in PROFILES:
+                    connection.close()
+                    path = os.path.join(directory, f'{name}.sqlite3')
+                    copy_sqlite_database(template, path)
+                    settings_dict.update(database(path))
+                    with override_settings(**overrides):
+                        self.report(name, sessions, users)
+            finally:
+                connection.close()
+                settings_dict.clear()
+                settings_dict.update(original)
+
+    def populate(self, clients, lobbies):
+        User = get_user_model()
+        host = User.objects.create_user(username='bench_host', email='bench_host@example.com')
+        users = User.objects.bulk_create([
+            User(username=f'bench_writer_{i}', email=f'bench_writer_{i}@example.com') for i in range(clients)
+        ])
+        sessions = []
+        for i in range(lobbies):
+            quiz = Quiz.objects.create(title=f'bench {i}', owner=host)
+            for q in range(5):
+                question = Question.objects.create(quiz=quiz, text=f'Q{q}')
+                Choice.objects.bulk_create([Choice(question=question, text='C', is_correct=c == 0) for c in range(4)])
+            sessions.append(QuizSession.objects.create(quiz=quiz, host=host, room_code=quiz.room_code))
+        return sessions, users
+
+    def report(self, name, sessions, users):
+        timings, errors = [], []
+        start_line = threading.Barrier(len(users) + 1)
+
+        def run(user):
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            start_line.wait()
+            for session in sessions:
+                for method, url, data in (
+                    ('post', '/api/quiz-sessions/join/', {'room_code': session.room_code}),
+                    ('post', f'/api/quiz-sessions/{session.pk}/submit/', {'answers': {}}),
+                ):
+                    t0 = time.perf_counter()
+                    response = getattr(client, method)(url, data, format='json')
+                    timings.append(time.perf_counter() - t0)
+                    if response.status_code >= 400:
+                        errors.append(response.status_code)
+            connection.close()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        start_line.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        timings.sort()
+        ok = len(timings) - len(errors)
+        self.stdout.write(
+            f"[{name}] {len(users)} clients, {len(timings)} writes in {elapsed:.1f}s: "
+            f"{ok / elapsed:.0f} ok/s, {len(errors)} errors; "
+            f"{percentiles(timings)}, "
+            f"mean {ms(statistics.mean(timings))}"
+        )
@@ -0,0 +1,147 @@
+import itertools
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from quiz.models import Choice, Question, Quiz, QuizSession
+from quiz.throttling import TokenBucketThrottle
+from quiz_backend.benchmarks import percentiles
+from quiz_backend.sqlite_settings import sqlite_database
+
+NO_RATES = {'join_user': None, 'join_room': None, 'submit_user': None, 'submit_room': None}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for the join/submit throttles and the write concurrency "
+        "limit: paced clients write to ten quiet rooms while storm threads "
+        "hammer one room as fast as their rate allows, ignoring 429s. Reports "
+        "the quiet rooms' latency with no storm, with the storm and no "
+        "protection, and with the storm and the default throttles. Runs on a "
+        "throwaway SQLite file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=8, help="Length of each phase.")
+        parser.add_argument('--clients', type=int, default=4, help="Paced client threads on the quiet rooms.")
+        parser.add_argument('--rate', type=float, default=10, help="Requests per second of each paced client.")
+        parser.add_argument('--storm-clients', type=int, default=8)
+        parser.add_argument('--storm-rate', type=float, default=50, help="Requests per second of each storm thread.")
+
+    def handle(self, **options):
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict)
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                connection.close()
+                settings_dict.update(sqlite_database(os.path.join(directory, 'bench.sqlite3')))
+                call_command('migrate', verbosity=0)
+                self.run(**options)
+            finally:
+                connection.close()
+                settings_dict.clear()
+                settings_dict.update(original)
+
+    def run(self, seconds, clients, rate, storm_clients, storm_rate, **options):
+        User = get_user_model()
+        host = User.objects.create_user(username='bench_host', email='bench_host@example.com')
+        rooms = []
+        for i in range(11):
+            quiz = Quiz.objects.create(title=f'bench {i}', owner=host)
+            question = Question.objects.create(quiz=quiz, text='Q')
+            Choice.objects.bulk_create([Choice(question=question, text='C', is_correct=c == 0) for c in range(4)])
+            rooms.append(QuizSession.objects.create(quiz=quiz, host=host, room_code=quiz.room_code))
+        storm_room, quiet_rooms = rooms[0], rooms[1:]
+        per_client = int(seconds * rate) + 1
+        players = User.objects.bulk_create([
+            User(username=f'bench_quiet_{i}', email=f'bench_quiet_{i}@example.com')
+            for i in range(clients * per_client)
+        ])
+        storm_players = User.objects.bulk_create([
+            User(username=f'bench_storm_{i}', email=f'bench_storm_{i}@example.com') for i in range(1_000)
+        ])
+        pools = [players[i * per_client:(i + 1) * per_client] for i in range(clients)]
+
+        phases = (
+            ('no storm', 0, NO_RATES, None),
+            ('storm, unprotected', storm_clients, NO_RATES, None),
+            ('storm, throttled', storm_clients, TokenBucketThrottle.THROTTLE_RATES, 32),
+        )
+        for name, storm_threads, rates, limit in phases:
+            caches['throttle'].clear()
+            with (
+                mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates),
+                override_settings(QUIZ_MAX_CONCURRENT_WRITES=limit),
+            ):
+                self.phase(name, seconds, rate, pools, quiet_rooms, storm_threads, storm_rate, storm_room,
+                           storm_players)
+
+    def phase(self, name, seconds, rate, pools, quiet_rooms, storm_threads, storm_rate, storm_room, storm_players):
+        deadline = time.perf_counter() + seconds
+        timings, quiet_shed, storm_counts = [], [], []
+
+        def request_for(room):
+            return (
+                ('/api/quiz-sessions/join/', {'room_code': room.room_code}),
+                (f'/api/quiz-sessions/{room.pk}/submit/', {'answers': {}}),
+            )[random.getrandbits(1)]
+
+        def paced(pool, interval, room_of, record):
+            client = APIClient(raise_request_exception=False)
+            next_request = time.perf_counter()
+            for user in itertools.cycle(pool):
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                time.sleep(max(next_request - now, 0))
+                next_request += interval
+                client.force_authenticate(user)
+                url, data = request_for(room_of())
+                t0 = time.perf_counter()
+                response = client.post(url, data, format='json')
+                record(time.perf_counter() - t0, response.status_code)
+            connection.close()
+
+        def quiet(elapsed, code):
+            timings.append(elapsed)
+            if code == 429:
+                quiet_shed.append(code)
+
+        threads = [
+            threading.Thread(target=paced, args=(pool, 1 / rate, lambda: random.choice(quiet_rooms), quiet))
+            for pool in pools
+        ]
+        storm_pools = [storm_players[i::storm_threads] for i in range(storm_threads)]
+        threads += [
+            threading.Thread(
+                target=paced,
+                args=(pool, 1 / storm_rate, lambda: storm_room, lambda elapsed, code: storm_counts.append(code)),
+            )
+            for pool in storm_pools
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        timings.sort()
+        storm = (
+            f"; storm room {sum(code < 400 for code in storm_counts)} written, "
+            f"{storm_counts.count(429)} shed with 429" if storm_counts else ""
+        )
+        self.stdout.write(
+            f"[{name}] quiet rooms x{len(timings)}: {percentiles(timings)}, {len(quiet_shed)} shed{storm}"
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from quiz.leaderboard import rebuild_player_scores
+from quiz.models import PlayerScore
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the denormalized PlayerScore rows (leaderboard totals and the "
+        "per-user stats behind /api/users/me/stats/) from QuizResult and archived sessions."
+    )
+
+    def handle(self, *args, **options):
+        rebuild_player_scores()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {PlayerScore.objects.count()} player scores."))
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_sqlite_database(source, target):
+    """
+    Copies one SQLite file onto another with the online backup API, which
+    is safe while the source is being written to.
+    """
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the SQLite 'default' database onto a SQLite replica alias, once or "
+        "every --interval seconds, to try replica routing locally with two files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', default='replica', help="Database alias to copy onto.")
+        parser.add_argument('--interval', type=float, default=None, help="Keep copying at this interval.")
+
+    def handle(self, replica, interval, **options):
+        source = connections['default'].settings_dict
+        target = connections[replica].settings_dict
+        if 'sqlite3' not in source['ENGINE'] or 'sqlite3' not in target['ENGINE']:
+            raise CommandError("Both databases must be SQLite files.")
+        if str(source['NAME']) == str(target['NAME']):
+            raise CommandError(f"'{replica}' points at the primary's file; give it a NAME of its own.")
+        while True:
+            start = time.perf_counter()
+            copy_sqlite_database(source['NAME'], target['NAME'])
+            self.stdout.write(f"Copied to {target['NAME']} in {(time.perf_counter() - start) * 1000:.0f}ms")
+            if interval is None:
+                return
+            time.sleep(interval)
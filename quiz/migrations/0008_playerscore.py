@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_player_scores(apps, schema_editor):
+    PlayerScore = apps.get_model('quiz', 'PlayerScore')
+    QuizResult = apps.get_model('quiz', 'QuizResult')
+    totals = QuizResult.objects.values('user_id').annotate(total=Sum('score'))
+    PlayerScore.objects.bulk_create(
+        [PlayerScore(user_id=row['user_id'], total_score=row['total']) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_alter_quizsession_host_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_score', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='player_score', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_score', 'user'], name='quiz_playerscore_rank_idx')],
+            },
+        ),
+        migrations.RunPython(populate_player_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_playerscore'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Adopt the existing auto-created participants table as an explicit
+        # through model; only Django's state changes, the table is reused.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='SessionParticipant',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('session', models.ForeignKey(db_column='quizsession_id', on_delete=django.db.models.deletion.CASCADE, to='quiz.quizsession')),
+                        ('user', models.ForeignKey(db_column='customuser_id', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'quiz_quizsession_participants',
+                        'unique_together': {('session', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='quizsession',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='quiz_sessions', through='quiz.SessionParticipant', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sessionparticipant',
+            name='joined_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='sessionparticipant',
+            index=models.Index(fields=['session', 'joined_version'], name='quiz_participant_version_idx'),
+        ),
+    ]
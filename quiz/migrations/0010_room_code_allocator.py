@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_session_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReleasedRoomCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=6, unique=True)),
+                ('released_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoomCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='room_code',
+            field=models.CharField(blank=True, db_index=True, max_length=6),
+        ),
+        migrations.AlterField(
+            model_name='quizsession',
+            name='room_code',
+            field=models.CharField(max_length=6),
+        ),
+        migrations.AddConstraint(
+            model_name='quizsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'finished'), _negated=True), fields=('room_code',), name='quiz_unique_active_room_code'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def uppercase_room_codes(apps, schema_editor):
+    for model_name in ('Quiz', 'QuizSession'):
+        apps.get_model('quiz', model_name).objects.update(room_code=Upper('room_code'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_room_code_allocator'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_room_codes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['room_code', 'status'], name='quiz_session_code_status_idx'),
+        ),
+    ]
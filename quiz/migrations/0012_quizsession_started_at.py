@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_normalize_room_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_quizsession_started_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['-created_at', '-id'], name='quiz_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='quiz_session_status_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['host', '-created_at', '-id'], name='quiz_session_host_list_idx'),
+        ),
+    ]
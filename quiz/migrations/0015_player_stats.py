@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+def populate_player_stats(apps, schema_editor):
+    PlayerScore = apps.get_model('quiz', 'PlayerScore')
+    QuizResult = apps.get_model('quiz', 'QuizResult')
+    ArchivedSession = apps.get_model('quiz', 'ArchivedSession')
+
+    stats = {}
+
+    def add(user_id, score, total_questions, quiz_title):
+        row = stats.setdefault(user_id, {
+            'quizzes_played': 0, 'total_questions': 0, 'percentage_sum': 0.0,
+            'best_percentage': None, 'best_score': 0, 'best_total_questions': 0, 'best_quiz_title': '',
+        })
+        percentage = round(100 * score / total_questions, 2) if total_questions else 0.0
+        row['quizzes_played'] += 1
+        row['total_questions'] += total_questions
+        row['percentage_sum'] += percentage
+        if row['best_percentage'] is None or percentage > row['best_percentage']:
+            row.update(
+                best_percentage=percentage, best_score=score,
+                best_total_questions=total_questions, best_quiz_title=quiz_title,
+            )
+
+    for quiz_title, results in ArchivedSession.objects.values_list('quiz_title', 'results').iterator():
+        for user_id, score, total_questions, _ in results:
+            add(user_id, score, total_questions, quiz_title)
+    for row in QuizResult.objects.order_by('id').values_list('user_id', 'score', 'total_questions', 'quiz__title'):
+        add(*row)
+
+    rows = list(PlayerScore.objects.filter(user_id__in=stats))
+    for row in rows:
+        for field, value in stats[row.user_id].items():
+            setattr(row, field, value)
+    if rows:
+        PlayerScore.objects.bulk_update(rows, list(stats[rows[0].user_id]), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_archived_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerscore',
+            name='best_percentage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='best_quiz_title',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='best_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='best_total_questions',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='percentage_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='quizzes_played',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='playerscore',
+            name='total_questions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_player_stats, migrations.RunPython.noop),
+    ]
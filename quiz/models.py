@@ -1,17 +1,33 @@
 import random
 import string
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.contrib.auth import get_user_model
 
 def generate_room_code():
     """Generates a random 6-character room code."""
+    # Kept for migration 0006; new codes come from quiz.room_codes.allocate_room_code.
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
+def normalize_room_code(code):
+    """Room codes are case-insensitive; they are stored and looked up upper-case."""
+    return str(code).strip().upper()
+
 class Quiz(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    room_code = models.CharField(max_length=6, default=generate_room_code, unique=True)
+    # Unique among unfinished sessions only; codes of finished sessions are recycled.
+    room_code = models.CharField(max_length=6, blank=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if not self.room_code:
+            from .room_codes import allocate_room_code
+            self.room_code = allocate_room_code()
+        self.room_code = normalize_room_code(self.room_code)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -32,6 +48,49 @@ class Choice(models.Model):
     def __str__(self):
         return f"{self.question.text[:20]}... -> {self.text}"
 
+class QuizSessionQuerySet(models.QuerySet):
+    """
+    Querysets shaped for each way a session is read, so no serializer or
+    view falls back to lazy per-row queries.
+    """
+
+    def for_detail(self, participants=True):
+        """
+        What QuizSessionSerializer needs: host joined in, participants
+        prefetched (id and username only). The quiz body comes from
+        quiz.content, so the quiz itself is never loaded.
+        """
+        queryset = self.select_related('host').only(
+            'id', 'quiz_id', 'room_code', 'status', 'version', 'host__id', 'host__username',
+        )
+        if participants:
+            queryset = queryset.prefetch_related(participants_prefetch())
+        return queryset
+
+    def for_list(self):
+        """
+        Slim rows for the session list, with the quiz title and participant
+        count computed in the same query.
+        """
+        participant_count = Subquery(
+            SessionParticipant.objects.filter(session=OuterRef('pk'))
+            .values('session').annotate(count=Count('pk')).values('count')
+        )
+        return self.annotate(
+            quiz_title=F('quiz__title'), participant_count=Coalesce(participant_count, Value(0)),
+        ).only('id', 'room_code', 'status', 'created_at')
+
+    def for_update(self):
+        """
+        Just the columns the game actions (start, finish, answer, submit) read and write.
+        """
+        return self.only('id', 'quiz_id', 'host_id', 'status', 'room_code', 'version', 'started_at')
+
+
+def participants_prefetch():
+    return Prefetch('participants', queryset=get_user_model().objects.only('id', 'username'))
+
+
 class QuizSession(models.Model):
     STATUS_CHOICES = [
         ('lobby', 'Lobby'),
@@ -40,20 +99,97 @@ class QuizSession(models.Model):
     ]
     quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name="session")
     host = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='quiz_sessions')
+    participants = models.ManyToManyField(
+        settings.AUTH_USER_MODEL, related_name='quiz_sessions', through='SessionParticipant'
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='lobby')
-    room_code = models.CharField(max_length=6, unique=True)
+    room_code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every visible state change so pollers can skip unchanged state.
+    version = models.PositiveIntegerField(default=0)
+
+    objects = QuizSessionQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         # Copy the room_code from the related Quiz when the session is created
         if not self.room_code:
             self.room_code = self.quiz.room_code
+        # Codes are stored upper-case so joins can use an exact index match.
+        self.room_code = normalize_room_code(self.room_code)
         super().save(*args, **kwargs)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['room_code'], condition=~models.Q(status='finished'), name='quiz_unique_active_room_code'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['room_code', 'status'], name='quiz_session_code_status_idx'),
+            # Session list: newest first, optionally by status or host.
+            models.Index(fields=['-created_at', '-id'], name='quiz_session_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='quiz_session_status_list_idx'),
+            models.Index(fields=['host', '-created_at', '-id'], name='quiz_session_host_list_idx'),
+        ]
+
+    def bump_version(self):
+        """
+        Atomically increments the state version and returns the new value.
+        """
+        QuizSession.objects.filter(pk=self.pk).update(version=F('version') + 1)
+        self.refresh_from_db(fields=['version'])
+        return self.version
+
+    @staticmethod
+    def make_etag(pk, version, pending=0):
+        # `pending` counts batched joins not written yet (see quiz.join_queue).
+        if pending:
+            return f'"{pk}-{version}.{pending}"'
+        return f'"{pk}-{version}"'
+
+    @property
+    def etag(self):
+        return self.make_etag(self.pk, self.version)
+
     def __str__(self):
         return f"Session for '{self.quiz.title}' - Status: {self.status}"
 
+class SessionParticipant(models.Model):
+    """
+    Through table for QuizSession.participants, recording the session version
+    at which each user joined so pollers can fetch only new participants.
+    """
+    session = models.ForeignKey(QuizSession, on_delete=models.CASCADE, db_column='quizsession_id')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_column='customuser_id')
+    joined_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'quiz_quizsession_participants'
+        unique_together = [('session', 'user')]
+        indexes = [
+            models.Index(fields=['session', 'joined_version'], name='quiz_participant_version_idx'),
+        ]
+
+class RoomCodeSequence(models.Model):
+    """
+    Single-row counter feeding the room code permutation. Workers reserve
+    blocks of values from it (see quiz.room_codes).
+    """
+    next_value = models.BigIntegerField(default=0)
+
+
+class ReleasedRoomCode(models.Model):
+    """
+    Room codes given back by finished sessions, reused oldest first.
+    """
+    code = models.CharField(max_length=6, unique=True)
+    released_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.code
+
 class QuizResult(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
@@ -64,3 +200,74 @@ class QuizResult(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title}: {self.score}/{self.total_questions}"
 
+
+def result_percentage(score, total_questions):
+    return round(100 * score / total_questions, 2) if total_questions else 0.0
+
+
+class PlayerScore(models.Model):
+    """
+    Denormalized summary of a user's QuizResults (running total, play count,
+    average and best result), kept in step on every submission so neither
+    the leaderboard nor the profile page ever has to aggregate results.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='player_score')
+    total_score = models.IntegerField(default=0)
+    quizzes_played = models.PositiveIntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    # Sum of per-quiz percentages; the average is this over quizzes_played.
+    percentage_sum = models.FloatField(default=0)
+    best_percentage = models.FloatField(null=True, blank=True)
+    best_score = models.IntegerField(default=0)
+    best_total_questions = models.IntegerField(default=0)
+    # A title rather than a foreign key, so archiving the quiz keeps it.
+    best_quiz_title = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_score', 'user'], name='quiz_playerscore_rank_idx'),
+        ]
+
+    @property
+    def average_percentage(self):
+        return round(self.percentage_sum / self.quizzes_played, 2) if self.quizzes_played else 0.0
+
+    def add_result(self, score, total_questions, quiz_title):
+        """
+        Applies one result in memory, for batch writes and rebuilds.
+        """
+        percentage = result_percentage(score, total_questions)
+        self.total_score += score
+        self.quizzes_played += 1
+        self.total_questions += total_questions
+        self.percentage_sum += percentage
+        if self.best_percentage is None or percentage > self.best_percentage:
+            self.best_percentage = percentage
+            self.best_score = score
+            self.best_total_questions = total_questions
+            self.best_quiz_title = quiz_title
+
+    def __str__(self):
+        return f"{self.user.username}: {self.total_score}"
+
+
+class ArchivedSession(models.Model):
+    """
+    Compact record of a finished session moved out of the live tables by
+    quiz.archive: one row per session, with its results packed as
+    [user id, score, total questions, completed at (epoch seconds)] lists.
+    """
+    session_id = models.BigIntegerField(unique=True)
+    quiz_title = models.CharField(max_length=200)
+    room_code = models.CharField(max_length=6)
+    host = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name='+')
+    question_count = models.PositiveIntegerField()
+    participant_count = models.PositiveIntegerField()
+    results = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived session {self.session_id} ('{self.quiz_title}')"
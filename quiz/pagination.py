@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class SessionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over sessions, newest first. Each page is one indexed
+    range scan from the cursor position, so deep pages cost the same as the
+    first one and rows inserted meanwhile never shift a page.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,39 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import FastJSONRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    DRF's JSONParser, paired with the renderer that understands
+    JSONFragment values; the browsable API renders its raw-data form with
+    the parser's renderer_class.
+    """
+
+    renderer_class = JSONRenderer
+
+
+class FastJSONParser(JSONParser):
+    """
+    Decodes request bodies with orjson when it is installed, falling back to
+    DRF's JSONParser otherwise or for bodies not encoded as UTF-8.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
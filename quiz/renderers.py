@@ -0,0 +1,89 @@
+import secrets
+
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class JSONFragment:
+    """
+    Already-rendered JSON bytes to be spliced into a response verbatim.
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's JSONRenderer, plus support for JSONFragment values at the top level
+    of a dict, which are spliced into the output without being decoded and
+    re-encoded.
+    """
+
+    # Unguessable, so it cannot collide with user content.
+    placeholder_prefix = f'@@fragment-{secrets.token_hex(8)}-'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        fragments = []
+        data = self._extract_fragments(data, fragments)
+        body = self.encode(data, accepted_media_type, renderer_context)
+        for index, fragment in enumerate(fragments):
+            placeholder = f'"{self.placeholder_prefix}{index}"'.encode()
+            body = body.replace(placeholder, fragment.raw, 1)
+        return body
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def _extract_fragments(self, data, fragments):
+        if not isinstance(data, dict) or not any(isinstance(v, JSONFragment) for v in data.values()):
+            return data
+        replaced = dict(data)
+        for key, value in data.items():
+            if isinstance(value, JSONFragment):
+                replaced[key] = f'{self.placeholder_prefix}{len(fragments)}'
+                fragments.append(value)
+        return replaced
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Encodes with orjson when it is installed, falling back to the standard
+    library encoder otherwise, or when the client asks for indented output or
+    UNICODE_JSON / COMPACT_JSON are turned off.
+
+    Datetimes go through DRF's encoder, and data orjson cannot encode (such
+    as integers beyond 64 bits) is rendered by the standard library, so the
+    output is the same bytes except for floats. Both write the shortest
+    digits that round-trip, so every float decodes to the same value, but
+    orjson spells exponents differently (1e16, 1.5e-7 and 0.00001 where the
+    standard library writes 1e+16, 1.5e-07 and 1e-05); floats between 1e-4
+    and 1e16 match byte for byte. NaN and infinite floats render as null,
+    where the standard library renderer raises (or, with STRICT_JSON off,
+    emits NaN/Infinity).
+    """
+
+    _default = staticmethod(encoders.JSONEncoder().default)
+    _options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else None
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or not (api_settings.UNICODE_JSON and api_settings.COMPACT_JSON)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().encode(data, accepted_media_type, renderer_context)
+        try:
+            body = orjson.dumps(data, default=self._default, option=self._options)
+        except orjson.JSONEncodeError:
+            return super().encode(data, accepted_media_type, renderer_context)
+        # Like DRF, escape the two characters that are valid JSON but not valid JavaScript.
+        return body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,147 @@
+import string
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache import LRUCache
+from .models import QuizSession, ReleasedRoomCode, RoomCodeSequence, normalize_room_code
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# f(n) = (A * n + C) mod CODE_SPACE is a bijection because A is coprime to
+# 36 ** 6 (= 2 ** 12 * 3 ** 12), so consecutive sequence values map to
+# distinct, scattered-looking codes and never repeat until the space wraps.
+_MULTIPLIER = 1_580_030_173
+_OFFSET = 1_046_527_861
+
+BLOCK_SIZE = getattr(settings, 'QUIZ_ROOM_CODE_BLOCK_SIZE', 100)
+REUSE_DELAY = timedelta(seconds=getattr(settings, 'QUIZ_ROOM_CODE_REUSE_DELAY', 3600))
+
+
+class RoomCodesExhausted(Exception):
+    pass
+
+
+def encode(value):
+    """
+    Encodes an integer in [0, CODE_SPACE) as a 6-character room code.
+    """
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def permute(value):
+    return (_MULTIPLIER * value + _OFFSET) % CODE_SPACE
+
+
+class _SequenceBlock:
+    """
+    A range of sequence values reserved by this process, so most
+    allocations cost no database write.
+    """
+
+    def __init__(self):
+        self.next = self.end = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.next >= self.end:
+                self.next, self.end = self._reserve()
+            value = self.next
+            self.next += 1
+            return value
+
+    def reset(self):
+        with self._lock:
+            self.next = self.end = 0
+
+    @staticmethod
+    def _reserve():
+        with transaction.atomic():
+            sequence, _ = RoomCodeSequence.objects.select_for_update().get_or_create(pk=1)
+            start = sequence.next_value
+            if start >= CODE_SPACE:
+                raise RoomCodesExhausted('Every room code in the sequence has been handed out.')
+            sequence.next_value = min(start + BLOCK_SIZE, CODE_SPACE)
+            sequence.save(update_fields=['next_value'])
+        return start, sequence.next_value
+
+
+_block = _SequenceBlock()
+
+# Open lobby room code -> session id, so joins resolve by primary key.
+_open_lobbies = LRUCache(maxsize=getattr(settings, 'QUIZ_OPEN_LOBBY_CACHE_SIZE', 10_000))
+
+
+def _pop_released_code():
+    cutoff = timezone.now() - REUSE_DELAY
+    with transaction.atomic():
+        released = (
+            ReleasedRoomCode.objects.select_for_update(skip_locked=True)
+            .filter(released_at__lte=cutoff)
+            .order_by('released_at')
+            .first()
+        )
+        if released is None:
+            return None
+        released.delete()
+    return released.code
+
+
+def _in_use(code):
+    return QuizSession.objects.filter(room_code=code).exclude(status='finished').exists()
+
+
+def allocate_room_code():
+    """
+    Returns a room code not held by any unfinished session: a recycled code
+    when one has cooled down, otherwise the next code of the permutation.
+    """
+    code = _pop_released_code()
+    while code is None or _in_use(code):
+        # Only codes minted by the old random generator can still be in use.
+        code = encode(permute(_block.take()))
+    return code
+
+
+def release_room_code(code):
+    """
+    Returns a finished session's code to the pool once it cools down.
+    """
+    try:
+        with transaction.atomic():
+            ReleasedRoomCode.objects.create(code=code)
+    except IntegrityError:
+        # Already released.
+        pass
+
+
+def find_open_lobby(code):
+    """
+    Returns the session in the lobby state with this room code, or raises
+    QuizSession.DoesNotExist. Cached ids are re-checked against the lobby
+    status, so a stale entry (e.g. started by another worker) is harmless.
+    """
+    code = normalize_room_code(code)
+    session_id = _open_lobbies.get(code)
+    if session_id is not None:
+        session = QuizSession.objects.for_detail(participants=False).filter(pk=session_id, status='lobby').first()
+        if session is not None:
+            return session
+        _open_lobbies.delete(code)
+    session = QuizSession.objects.for_detail(participants=False).get(room_code=code, status='lobby')
+    _open_lobbies.set(code, session.pk)
+    return session
+
+
+def forget_open_lobby(code):
+    _open_lobbies.delete(normalize_room_code(code))
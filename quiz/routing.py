@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import LobbyConsumer
+
+websocket_urlpatterns = [
+    path('ws/quiz-sessions/<int:pk>/', LobbyConsumer.as_asgi()),
+]
@@ -0,0 +1,246 @@
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from quiz_backend.sqlite import write_lock
+
+from .events import broadcast_session_event
+from .state import get_state_backend
+
+logger = logging.getLogger(__name__)
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: a ring of `size` slots, each covering `tick`
+    seconds. A timer lives in the slot of its deadline's tick, so scheduling
+    and cancelling are O(1) and each tick only looks at one slot, no matter
+    how many timers are pending. Timers more than one revolution away share
+    the slot and are simply skipped until their deadline comes round.
+    """
+
+    def __init__(self, tick=0.1, size=512, now=None):
+        self.tick = tick
+        self.size = size
+        self.slots = [{} for _ in range(size)]
+        self._locations = {}  # timer id -> slot index
+        self._ids = itertools.count()
+        self._current_tick = self._tick_of(time.time() if now is None else now)
+        self._lock = threading.Lock()
+
+    def _tick_of(self, timestamp):
+        return int(timestamp // self.tick)
+
+    def schedule(self, deadline, item):
+        """
+        Adds a timer and returns its id.
+        """
+        timer_id = next(self._ids)
+        with self._lock:
+            # A deadline already in the past fires on the next tick.
+            slot = max(self._tick_of(deadline), self._current_tick + 1) % self.size
+            self.slots[slot][timer_id] = (deadline, item)
+            self._locations[timer_id] = slot
+        return timer_id
+
+    def cancel(self, timer_id):
+        with self._lock:
+            slot = self._locations.pop(timer_id, None)
+            if slot is not None:
+                del self.slots[slot][timer_id]
+
+    def advance(self, now):
+        """
+        Moves the wheel up to `now` and returns the (deadline, item) pairs that expired.
+        """
+        expired = []
+        with self._lock:
+            # Only ticks that have fully elapsed are processed, so nothing fires early.
+            target = self._tick_of(now) - 1
+            first = self._current_tick + 1
+            # After a long stall every slot is visited once.
+            for tick in range(max(first, target - self.size + 1), target + 1):
+                slot = self.slots[tick % self.size]
+                due = [timer_id for timer_id, (deadline, _) in slot.items() if self._tick_of(deadline) <= tick]
+                for timer_id in due:
+                    expired.append(slot.pop(timer_id))
+                    del self._locations[timer_id]
+            self._current_tick = max(self._current_tick, target)
+        return expired
+
+    def __len__(self):
+        return len(self._locations)
+
+
+# Ids of the sessions with an armed question timer, and per session the
+# question it is armed for and its deadline, in the session-state backend,
+# so any worker can take over a game whose worker has gone away.
+LIVE_GAMES_KEY = 'scheduler:games'
+
+
+def schedule_key(session_id):
+    return f'scheduler:game:{session_id}'
+
+
+class QuestionScheduler:
+    """
+    Advances every live game to its next question when the current one's
+    time limit runs out, from a single background thread driving one
+    timing wheel for all sessions.
+
+    Each armed timer is also recorded in the session-state backend. Every
+    `sweep_interval` seconds the thread arms timers for games whose
+    deadline passed that long ago without being advanced, e.g. because the
+    worker that started them restarted; with a shared state backend any
+    worker can pick these up. Each question is advanced once, by whichever
+    worker claims it first. `state` defaults to the configured backend.
+    """
+
+    def __init__(self, tick=0.1, size=512, on_expire=None, sweep_interval=5.0, state=None):
+        self.wheel = TimingWheel(tick, size)
+        self._state = state
+        self.on_expire = on_expire or advance_game
+        self.sweep_interval = sweep_interval
+        self._adopted = set()  # (session id, deadline) armed by the sweep
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return get_state_backend() if self._state is None else self._state
+
+    def schedule(self, deadline, session_id, question_index):
+        state = self.state
+        state.hash_update(schedule_key(session_id), {'index': question_index, 'deadline': deadline})
+        state.set_add(LIVE_GAMES_KEY, session_id)
+        return self._arm(deadline, session_id, question_index)
+
+    def _arm(self, deadline, session_id, question_index):
+        self._ensure_running()
+        return self.wheel.schedule(deadline, (session_id, question_index))
+
+    def schedule_game(self, game):
+        """
+        Arms the timer for the question open right now.
+        """
+        index = game.current_index()
+        if index < game.total_questions:
+            self.schedule(game.deadlines[index], game.session_id, index)
+        else:
+            self.schedule(time.time(), game.session_id, index)
+
+    def adopt_game(self, game):
+        """
+        Arms this process's timer for the open question of a game started
+        elsewhere, without recording it again.
+        """
+        index = game.current_index()
+        if index < game.total_questions:
+            self._arm(game.deadlines[index], game.session_id, index)
+
+    def adopt_overdue(self, now=None):
+        """
+        Arms timers for the recorded games whose deadline passed more than
+        `sweep_interval` seconds ago. Returns how many were armed.
+        """
+        now = time.time() if now is None else now
+        state = self.state
+        adopted = 0
+        for session_id in state.set_members(LIVE_GAMES_KEY):
+            fields = state.hash_get_all(schedule_key(session_id))
+            if 'deadline' not in fields:
+                # Finished meanwhile.
+                state.set_remove(LIVE_GAMES_KEY, session_id)
+                continue
+            deadline = float(fields['deadline'])
+            if deadline > now - self.sweep_interval or (session_id, deadline) in self._adopted:
+                continue
+            self._adopted.add((session_id, deadline))
+            self._arm(deadline, int(session_id), int(fields['index']))
+            adopted += 1
+        return adopted
+
+    def forget(self, session_id):
+        """
+        Drops the record of a finished session's timer.
+        """
+        state = self.state
+        state.delete(schedule_key(session_id))
+        state.set_remove(LIVE_GAMES_KEY, session_id)
+        with self._lock:
+            self._adopted = {(sid, deadline) for sid, deadline in self._adopted if sid != str(session_id)}
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quiz-question-scheduler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        tick = self.wheel.tick
+        next_sweep = time.time() + self.sweep_interval
+        while True:
+            time.sleep(tick - (time.time() % tick))
+            now = time.time()
+            for deadline, (session_id, question_index) in self.wheel.advance(now):
+                try:
+                    self.on_expire(self, session_id, question_index, deadline)
+                except Exception:
+                    logger.exception("Advancing quiz session %s failed", session_id)
+            if now >= next_sweep:
+                next_sweep = now + self.sweep_interval
+                try:
+                    self.adopt_overdue(now)
+                except Exception:
+                    logger.exception("Sweeping for overdue quiz sessions failed")
+            close_old_connections()
+
+
+def advance_game(scheduler, session_id, question_index, deadline):
+    """
+    Called when question `question_index` of a session closes: announces the
+    next question and arms its timer, or finishes the session after the last.
+    Only the first worker to get here for a given question does anything.
+    """
+    from .engine import InvalidTransition, finish_session, games
+    from .models import QuizSession
+
+    if not scheduler.state.hash_set_new(schedule_key(session_id), f'advanced:{question_index}:{deadline}', 1):
+        return
+    game = games.find(session_id)
+    if game is None:
+        # Started by another worker, or by this one before a restart.
+        session = QuizSession.objects.filter(pk=session_id, status='in_progress').first()
+        game = games.get(session) if session is not None else None
+        if game is None:
+            # Finished since the timer was armed.
+            scheduler.forget(session_id)
+            return
+    next_index = question_index + 1
+    if next_index < game.total_questions:
+        broadcast_session_event(
+            session_id, 'question_changed',
+            index=next_index, question_id=game.question_ids[next_index], deadline=game.deadlines[next_index],
+        )
+        scheduler.schedule(game.deadlines[next_index], session_id, next_index)
+        return
+    with write_lock():
+        session = QuizSession.objects.filter(pk=session_id, status='in_progress').first()
+        try:
+            if session is not None:
+                finish_session(session)
+                return
+        except InvalidTransition:
+            # Finished by the host (possibly on another worker) meanwhile.
+            pass
+        games.pop(session_id)
+
+
+question_scheduler = QuestionScheduler(
+    tick=getattr(settings, 'QUIZ_SCHEDULER_TICK_MS', 100) / 1000,
+    sweep_interval=getattr(settings, 'QUIZ_SCHEDULER_SWEEP_SECONDS', 5),
+)
@@ -0,0 +1,67 @@
+from django.conf import settings
+
+from .cache import LRUCache
+from .models import Question
+
+# Compiled answer keys, keyed by quiz id.
+_answer_keys = LRUCache(maxsize=getattr(settings, 'QUIZ_ANSWER_KEY_CACHE_SIZE', 1024))
+
+
+class AnswerKey:
+    """
+    The correct choice ids of every question in a quiz, compiled once so a
+    submission can be scored without touching the database.
+    """
+
+    __slots__ = ('correct_choices', 'total_questions')
+
+    def __init__(self, correct_choices):
+        # question id -> frozenset of correct choice ids
+        self.correct_choices = correct_choices
+        self.total_questions = len(correct_choices)
+
+    @classmethod
+    def compile(cls, quiz_id):
+        """
+        Builds the key for a quiz with a single query.
+        """
+        correct = {}
+        rows = Question.objects.filter(quiz_id=quiz_id).values_list(
+            'id', 'choices__id', 'choices__is_correct'
+        )
+        for question_id, choice_id, is_correct in rows:
+            choices = correct.setdefault(question_id, set())
+            if is_correct:
+                choices.add(choice_id)
+        return cls({q_id: frozenset(ids) for q_id, ids in correct.items()})
+
+    def score(self, answers):
+        """
+        Scores a mapping of question id (str or int) -> chosen choice id.
+        """
+        score = 0
+        for question_id, correct_ids in self.correct_choices.items():
+            user_choice_id = answers.get(str(question_id), answers.get(question_id))
+            if not user_choice_id:
+                continue
+            try:
+                if int(user_choice_id) in correct_ids:
+                    score += 1
+            except (TypeError, ValueError):
+                pass
+        return score
+
+
+def get_answer_key(quiz_id):
+    """
+    Returns the cached AnswerKey for a quiz, compiling it on a miss.
+    """
+    key = _answer_keys.get(quiz_id)
+    if key is None:
+        key = AnswerKey.compile(quiz_id)
+        _answer_keys.set(quiz_id, key)
+    return key
+
+
+def invalidate_answer_key(quiz_id):
+    _answer_keys.delete(quiz_id)
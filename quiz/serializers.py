@@ -1,6 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Quiz, Question, Choice, QuizSession
+from .content import quiz_body
+from .join_queue import join_queue
+from .models import Quiz, Question, Choice, QuizSession, PlayerScore
 
 User = get_user_model()
 
@@ -13,6 +16,29 @@ class LeaderboardSerializer(serializers.Serializer):
     total_score = serializers.IntegerField()
 
 
+class PlayerStatsSerializer(serializers.ModelSerializer):
+    """
+    A user's quiz history summary, straight from their PlayerScore row.
+    """
+    username = serializers.CharField(source='user.username')
+    average_percentage = serializers.FloatField()
+    best = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PlayerScore
+        fields = ['username', 'quizzes_played', 'total_score', 'total_questions', 'average_percentage', 'best']
+
+    def get_best(self, stats):
+        if stats.best_percentage is None:
+            return None
+        return {
+            'quiz_title': stats.best_quiz_title,
+            'score': stats.best_score,
+            'total_questions': stats.best_total_questions,
+            'percentage': stats.best_percentage,
+        }
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -36,14 +62,65 @@ class QuizDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'questions']
 
 # Serializer for viewing a lobby session
+def with_pending_participants(session, participants_data):
+    """
+    Appends users whose batched join has not been written yet.
+    """
+    known = {participant['username'] for participant in participants_data}
+    return list(participants_data) + [
+        {'username': username} for username in join_queue.pending(session.pk) if username not in known
+    ]
+
+
 class QuizSessionSerializer(serializers.ModelSerializer):
-    participants = UserSerializer(many=True, read_only=True)
+    participants = serializers.SerializerMethodField()
     host = UserSerializer(read_only=True)
-    quiz = QuizDetailSerializer(read_only=True)
+    # Quiz content never changes once hosted, so it is rendered once per quiz
+    # and spliced into the response by quiz.renderers.JSONRenderer.
+    quiz = serializers.SerializerMethodField()
 
     class Meta:
         model = QuizSession
-        fields = ['id', 'quiz', 'room_code', 'status', 'host', 'participants']
+        fields = ['id', 'quiz', 'room_code', 'status', 'version', 'host', 'participants']
+
+    def get_participants(self, session):
+        return with_pending_participants(session, UserSerializer(session.participants.all(), many=True).data)
+
+    def get_quiz(self, session):
+        return quiz_body(session.quiz_id)
+
+
+class QuizSessionListSerializer(serializers.ModelSerializer):
+    """
+    One row of the session list. `participant_count` and `quiz_title` are
+    annotated by QuizSessionQuerySet.for_list, so a page is a single query.
+    """
+    participant_count = serializers.SerializerMethodField()
+    quiz_title = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = QuizSession
+        fields = ['id', 'room_code', 'status', 'participant_count', 'quiz_title', 'created_at']
+
+    def get_participant_count(self, session):
+        return session.participant_count + join_queue.pending_count(session.pk)
+
+
+class QuizSessionDeltaSerializer(serializers.ModelSerializer):
+    """
+    Lobby state without the quiz body; `participants` is filled in by the
+    view with only the users who joined after the client's version.
+    """
+    participants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = QuizSession
+        fields = ['id', 'room_code', 'status', 'version', 'participants']
+
+    def get_participants(self, session):
+        return with_pending_participants(
+            session, UserSerializer(self.context['new_participants'], many=True).data
+        )
 
 # --- Writable Serializers for Creating a Quiz ---
 
@@ -67,11 +144,23 @@ class QuizCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ['room_code', 'id']
     
     def create(self, validated_data):
+        """
+        Creates the quiz with one batched insert for all questions and one
+        for all choices, so the cost does not grow with the quiz size.
+        """
         questions_data = validated_data.pop('questions')
-        quiz = Quiz.objects.create(**validated_data)
-        for question_data in questions_data:
-            choices_data = question_data.pop('choices')
-            question = Question.objects.create(quiz=quiz, **question_data)
-            for choice_data in choices_data:
-                Choice.objects.create(question=question, **choice_data)
-        return quiz
\ No newline at end of file
+        with transaction.atomic():
+            quiz = Quiz.objects.create(**validated_data)
+            questions = Question.objects.bulk_create([
+                Question(quiz=quiz, **{k: v for k, v in question_data.items() if k != 'choices'})
+                for question_data in questions_data
+            ])
+            if questions and questions[0].pk is None:
+                # Backends that cannot return ids from a bulk insert.
+                questions = list(quiz.questions.order_by('id'))
+            Choice.objects.bulk_create([
+                Choice(question=question, **choice_data)
+                for question, question_data in zip(questions, questions_data)
+                for choice_data in question_data['choices']
+            ])
+        return quiz
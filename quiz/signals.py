@@ -0,0 +1,60 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .archive import is_archiving
+from .content import invalidate_lobby_body, invalidate_quiz_body
+from .leaderboard import record_result, top_scores
+from .models import Choice, PlayerScore, Question, Quiz, QuizResult, QuizSession, result_percentage
+from .scoring import invalidate_answer_key
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    invalidate_answer_key(instance.pk)
+    invalidate_quiz_body(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_answer_key(instance.quiz_id)
+    invalidate_quiz_body(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    if is_archiving():
+        return
+    try:
+        quiz_id = instance.question.quiz_id
+    except Question.DoesNotExist:
+        # The question is already gone (cascade delete); it invalidated the key.
+        return
+    invalidate_answer_key(quiz_id)
+    invalidate_quiz_body(quiz_id)
+
+
+@receiver([post_save, post_delete], sender=QuizSession)
+def session_changed(sender, instance, **kwargs):
+    invalidate_lobby_body(instance.pk)
+
+
+@receiver(post_save, sender=QuizResult)
+def result_created(sender, instance, created, **kwargs):
+    if created:
+        record_result(instance)
+
+
+@receiver(post_delete, sender=QuizResult)
+def result_deleted(sender, instance, **kwargs):
+    if is_archiving():
+        # Archived results still count towards the totals.
+        return
+    # The best result is left as is; `manage.py rebuild_leaderboard` recomputes it.
+    PlayerScore.objects.filter(user_id=instance.user_id).update(
+        total_score=F('total_score') - instance.score,
+        quizzes_played=F('quizzes_played') - 1,
+        total_questions=F('total_questions') - instance.total_questions,
+        percentage_sum=F('percentage_sum') - result_percentage(instance.score, instance.total_questions),
+    )
+    top_scores.invalidate()
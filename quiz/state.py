@@ -0,0 +1,326 @@
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:  # Only needed by RedisStateBackend.
+    redis = None
+
+
+class SessionStateBackend:
+    """
+    Storage for hot room state that every worker process serving a room
+    must see: live scores, answered questions and lobby rosters.
+
+    The interface is a small subset of Redis hashes and sets, with string
+    keys, fields and values. Each method is atomic on its own.
+    """
+
+    def hash_set_new(self, key, field, value):
+        """
+        Sets a field only if it is not set yet; returns whether it was.
+        """
+        raise NotImplementedError
+
+    def hash_update(self, key, mapping):
+        raise NotImplementedError
+
+    def hash_incr(self, key, field, amount=1):
+        """
+        Adds `amount` to an integer field (missing fields count as 0) and returns the result.
+        """
+        raise NotImplementedError
+
+    def hash_get(self, key, field):
+        """
+        Returns a field's value, or None.
+        """
+        raise NotImplementedError
+
+    def hash_get_all(self, key):
+        raise NotImplementedError
+
+    def hash_pop_all(self, key):
+        """
+        Returns every field of a hash and deletes it, in one step.
+        """
+        raise NotImplementedError
+
+    def hash_len(self, key):
+        raise NotImplementedError
+
+    def set_add(self, key, *members):
+        """
+        Adds members to a set and returns how many were not in it yet.
+        """
+        raise NotImplementedError
+
+    def set_remove(self, key, *members):
+        raise NotImplementedError
+
+    def set_members(self, key):
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+
+class InProcessStateBackend(SessionStateBackend):
+    """
+    Dictionaries in this process. Right for a single worker (and for tests);
+    with several workers each one sees only its own players.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    def hash_set_new(self, key, field, value):
+        with self._lock:
+            fields = self._hashes.setdefault(key, {})
+            if str(field) in fields:
+                return False
+            fields[str(field)] = str(value)
+            return True
+
+    def hash_update(self, key, mapping):
+        with self._lock:
+            self._hashes.setdefault(key, {}).update((str(field), str(value)) for field, value in mapping.items())
+
+    def hash_incr(self, key, field, amount=1):
+        with self._lock:
+            fields = self._hashes.setdefault(key, {})
+            value = int(fields.get(str(field), 0)) + amount
+            fields[str(field)] = str(value)
+            return value
+
+    def hash_get(self, key, field):
+        return self._hashes.get(key, {}).get(str(field))
+
+    def hash_get_all(self, key):
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def hash_pop_all(self, key):
+        with self._lock:
+            return self._hashes.pop(key, {})
+
+    def hash_len(self, key):
+        return len(self._hashes.get(key, ()))
+
+    def set_add(self, key, *members):
+        with self._lock:
+            values = self._sets.setdefault(key, set())
+            before = len(values)
+            values.update(str(member) for member in members)
+            return len(values) - before
+
+    def set_remove(self, key, *members):
+        with self._lock:
+            self._sets.get(key, set()).difference_update(str(member) for member in members)
+
+    def set_members(self, key):
+        with self._lock:
+            return set(self._sets.get(key, ()))
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._hashes.pop(key, None)
+                self._sets.pop(key, None)
+
+
+class SQLiteStateBackend(SessionStateBackend):
+    """
+    A SQLite file shared by every worker process on one host (put it on
+    tmpfs, e.g. /dev/shm, to keep it in memory). WAL mode lets readers run
+    alongside the single writer; writes are single statements or short
+    IMMEDIATE transactions. Sets are stored as hashes with empty values.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._execute(
+            'CREATE TABLE IF NOT EXISTS state ('
+            ' key TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,'
+            ' PRIMARY KEY (key, field)) WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        # One connection per thread, and never one inherited across a fork.
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def _execute(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    def hash_set_new(self, key, field, value):
+        cursor = self._execute(
+            'INSERT INTO state (key, field, value) VALUES (?, ?, ?) ON CONFLICT DO NOTHING',
+            (key, str(field), str(value)),
+        )
+        return cursor.rowcount == 1
+
+    def hash_update(self, key, mapping):
+        self._connection().executemany(
+            'INSERT INTO state (key, field, value) VALUES (?, ?, ?)'
+            ' ON CONFLICT (key, field) DO UPDATE SET value = excluded.value',
+            [(key, str(field), str(value)) for field, value in mapping.items()],
+        )
+
+    def hash_incr(self, key, field, amount=1):
+        row = self._execute(
+            'INSERT INTO state (key, field, value) VALUES (?, ?, ?)'
+            ' ON CONFLICT (key, field) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value'
+            ' RETURNING value',
+            (key, str(field), amount),
+        ).fetchone()
+        return int(row[0])
+
+    def hash_get(self, key, field):
+        row = self._execute('SELECT value FROM state WHERE key = ? AND field = ?', (key, str(field))).fetchone()
+        return row[0] if row else None
+
+    def hash_get_all(self, key):
+        return dict(self._execute('SELECT field, value FROM state WHERE key = ?', (key,)).fetchall())
+
+    def hash_pop_all(self, key):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            fields = dict(connection.execute('SELECT field, value FROM state WHERE key = ?', (key,)).fetchall())
+            connection.execute('DELETE FROM state WHERE key = ?', (key,))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return fields
+
+    def hash_len(self, key):
+        return self._execute('SELECT COUNT(*) FROM state WHERE key = ?', (key,)).fetchone()[0]
+
+    def set_add(self, key, *members):
+        cursor = self._connection().executemany(
+            "INSERT INTO state (key, field, value) VALUES (?, ?, '') ON CONFLICT DO NOTHING",
+            [(key, str(member)) for member in members],
+        )
+        return cursor.rowcount
+
+    def set_remove(self, key, *members):
+        self._connection().executemany(
+            'DELETE FROM state WHERE key = ? AND field = ?', [(key, str(member)) for member in members]
+        )
+
+    def set_members(self, key):
+        return {row[0] for row in self._execute('SELECT field FROM state WHERE key = ?', (key,))}
+
+    def delete(self, *keys):
+        self._connection().executemany('DELETE FROM state WHERE key = ?', [(key,) for key in keys])
+
+
+class RedisStateBackend(SessionStateBackend):
+    """
+    Redis (or anything speaking its protocol), for workers spread over
+    several hosts. Every key gets a `ttl` (seconds) refreshed on write, so
+    state of rooms that were never closed cleanly expires on its own.
+    """
+
+    def __init__(self, url=None, client=None, prefix='quiz:', ttl=6 * 3600):
+        if client is None:
+            if redis is None:
+                raise ImportError("RedisStateBackend requires the 'redis' package.")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _write(self, key, command, *args, **kwargs):
+        key = self._key(key)
+        with self.client.pipeline() as pipe:
+            getattr(pipe, command)(key, *args, **kwargs)
+            pipe.expire(key, self.ttl)
+            return pipe.execute()[0]
+
+    @staticmethod
+    def _decode(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    def hash_set_new(self, key, field, value):
+        return bool(self._write(key, 'hsetnx', str(field), str(value)))
+
+    def hash_update(self, key, mapping):
+        if mapping:
+            self._write(key, 'hset', mapping={str(field): str(value) for field, value in mapping.items()})
+
+    def hash_incr(self, key, field, amount=1):
+        return int(self._write(key, 'hincrby', str(field), amount))
+
+    def hash_get(self, key, field):
+        return self._decode(self.client.hget(self._key(key), str(field)))
+
+    def hash_get_all(self, key):
+        return {
+            self._decode(field): self._decode(value)
+            for field, value in self.client.hgetall(self._key(key)).items()
+        }
+
+    def hash_pop_all(self, key):
+        key = self._key(key)
+        # MULTI/EXEC: nothing can write to the hash between the read and the delete.
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(key)
+            pipe.delete(key)
+            fields, _ = pipe.execute()
+        return {self._decode(field): self._decode(value) for field, value in fields.items()}
+
+    def hash_len(self, key):
+        return self.client.hlen(self._key(key))
+
+    def set_add(self, key, *members):
+        if not members:
+            return 0
+        return self._write(key, 'sadd', *(str(member) for member in members))
+
+    def set_remove(self, key, *members):
+        if members:
+            self.client.srem(self._key(key), *(str(member) for member in members))
+
+    def set_members(self, key):
+        return {self._decode(member) for member in self.client.smembers(self._key(key))}
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self._key(key) for key in keys))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend():
+    """
+    Returns the backend configured by QUIZ_STATE_BACKEND, built on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'QUIZ_STATE_BACKEND', {})
+                backend_class = import_string(config.get('BACKEND', 'quiz.state.InProcessStateBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
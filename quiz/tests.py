@@ -1,3 +1,1459 @@
-from django.test import TestCase
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import addModuleCleanup, mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from quiz_backend import metrics
+from quiz_backend.admission import write_admission
+from quiz_backend.db_router import pin_cache
+from quiz_backend.sqlite import WriteQueue, retry_on_busy
+from quiz_backend.sqlite_settings import sqlite_database
+from users.authentication import TokenAuthMiddleware
+
+from .archive import archive_batch, archive_cutoff
+from .cache import LRUCache
+from .engine import AnswerRejected, LiveGame, games
+from .events import broadcast_session_event, session_waiters
+from . import room_codes
+from .content import lobby_body, quiz_body
+from .join_queue import JoinQueue, join_queue
+from .leaderboard import STAT_FIELDS, rebuild_player_scores, top_scores
+from .models import (
+    ArchivedSession, Choice, PlayerScore, Question, Quiz, QuizResult, QuizSession, ReleasedRoomCode, RoomCodeSequence,
+    SessionParticipant,
+)
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer, JSONFragment, JSONRenderer
+from .routing import websocket_urlpatterns
+from .scheduler import LIVE_GAMES_KEY, QuestionScheduler, TimingWheel, advance_game, schedule_key
+from .scoring import AnswerKey, get_answer_key, invalidate_answer_key
+from .throttling import TokenBucketThrottle
+from .state import InProcessStateBackend, RedisStateBackend, SQLiteStateBackend, get_state_backend
+
+try:
+    import fakeredis
+except ImportError:  # The Redis backend tests are skipped without it.
+    fakeredis = None
+from .serializers import QuizDetailSerializer
+
+User = get_user_model()
+
+
+def setUpModule():
+    # Throttle buckets outlive each test's rolled-back users, whose ids are
+    # reused, so throttling is off here; WriteThrottleTests sets its own rates.
+    no_throttling = mock.patch.object(
+        TokenBucketThrottle, 'THROTTLE_RATES', dict.fromkeys(TokenBucketThrottle.THROTTLE_RATES)
+    )
+    no_throttling.start()
+    addModuleCleanup(no_throttling.stop)
+
+
+def make_quiz(owner, num_questions=3, num_choices=4, title='Quiz'):
+    """
+    Creates a quiz where the first choice of every question is the correct one.
+    """
+    quiz = Quiz.objects.create(title=title, owner=owner)
+    for i in range(num_questions):
+        question = Question.objects.create(quiz=quiz, text=f'Question {i}')
+        for j in range(num_choices):
+            Choice.objects.create(question=question, text=f'Choice {j}', is_correct=(j == 0))
+    return quiz
+
+
+def correct_answers(quiz):
+    return {
+        str(choice.question_id): choice.id
+        for choice in Choice.objects.filter(question__quiz=quiz, is_correct=True)
+    }
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='host', email='host@example.com')
+        self.quiz = make_quiz(self.user)
+        invalidate_answer_key(self.quiz.id)
+
+    def test_compile_uses_single_query(self):
+        with self.assertNumQueries(1):
+            key = AnswerKey.compile(self.quiz.id)
+        self.assertEqual(key.total_questions, 3)
+
+    def test_cached_key_needs_no_queries(self):
+        answers = correct_answers(self.quiz)
+        get_answer_key(self.quiz.id)
+        with self.assertNumQueries(0):
+            key = get_answer_key(self.quiz.id)
+            self.assertEqual(key.score(answers), 3)
+
+    def test_score_ignores_bad_answers(self):
+        key = get_answer_key(self.quiz.id)
+        self.assertEqual(key.score({}), 0)
+        self.assertEqual(key.score({'nope': 1, str(self.quiz.questions.first().id): 'abc'}), 0)
+
+    def test_question_without_correct_choice_counts_towards_total(self):
+        question = Question.objects.create(quiz=self.quiz, text='Open question')
+        Choice.objects.create(question=question, text='Wrong', is_correct=False)
+        key = get_answer_key(self.quiz.id)
+        self.assertEqual(key.total_questions, 4)
+        self.assertEqual(key.score(correct_answers(self.quiz)), 3)
+
+    def test_changing_choices_invalidates_key(self):
+        key = get_answer_key(self.quiz.id)
+        question = self.quiz.questions.first()
+        question.choices.update(is_correct=False)
+        new_choice = Choice.objects.create(question=question, text='New', is_correct=True)
+        self.assertIsNot(get_answer_key(self.quiz.id), key)
+        self.assertEqual(get_answer_key(self.quiz.id).score({str(question.id): new_choice.id}), 1)
+
+
+class SubmitTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.quiz = make_quiz(self.host, num_questions=5)
+        self.session = QuizSession.objects.create(quiz=self.quiz, host=self.host, status='in_progress')
+        self.client.force_authenticate(self.host)
+
+    def test_submit_scores_answers(self):
+        answers = correct_answers(self.quiz)
+        answers.pop(next(iter(answers)))
+        response = self.client.post(
+            f'/api/quiz-sessions/{self.session.id}/submit/', {'answers': answers}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'score': 4, 'total_questions': 5})
+        result = QuizResult.objects.get(user=self.host)
+        self.assertEqual((result.score, result.total_questions), (4, 5))
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        top_scores.invalidate()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com')
+            for i in range(12)
+        ]
+        self.quiz = make_quiz(self.users[0])
+        self.client.force_authenticate(self.users[0])
+
+    def add_result(self, user, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizResult.objects.create(user=user, quiz=self.quiz, score=score, total_questions=10)
+
+    def test_results_update_player_score(self):
+        self.add_result(self.users[1], 3)
+        self.add_result(self.users[1], 4)
+        self.assertEqual(PlayerScore.objects.get(user=self.users[1]).total_score, 7)
+
+    def test_leaderboard_returns_top_ten(self):
+        for i, user in enumerate(self.users):
+            self.add_result(user, i)
+        response = self.client.get('/api/quiz-sessions/leaderboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[0], {'username': 'user11', 'total_score': 11})
+        self.assertEqual(response.data[-1]['username'], 'user2')
+
+    def test_leaderboard_served_from_memory_and_updated_on_write(self):
+        self.add_result(self.users[0], 1)
+        self.client.get('/api/quiz-sessions/leaderboard/')
+        self.add_result(self.users[5], 50)
+        with self.assertNumQueries(0):
+            board = top_scores.top()
+        self.assertEqual(board[0], {'username': 'user5', 'total_score': 50})
+
+    def test_rebuild_command(self):
+        self.add_result(self.users[2], 5)
+        PlayerScore.objects.all().delete()
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(PlayerScore.objects.get(user=self.users[2]).total_score, 5)
+
+    def test_deleting_results_updates_player_score(self):
+        self.add_result(self.users[3], 5)
+        self.quiz.delete()
+        self.assertEqual(PlayerScore.objects.get(user=self.users[3]).total_score, 0)
+
+
+class LobbyConsumerTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host, num_questions=1), host=self.host)
+        self.application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def communicator(self, user):
+        token = Token.objects.create(user=user)
+        path = f'/ws/quiz-sessions/{self.session.id}/?token={token.key}'
+        return WebsocketCommunicator(self.application, path)
+
+    async def test_members_receive_session_events(self):
+        communicator = await database_sync_to_async(self.communicator)(self.host)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        def broadcast():
+            with self.captureOnCommitCallbacks(execute=True):
+                broadcast_session_event(self.session.id, 'participant_joined', username='student')
+
+        await database_sync_to_async(broadcast)()
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {'event': 'participant_joined', 'username': 'student'},
+        )
+        await communicator.disconnect()
+
+    async def test_non_members_are_rejected(self):
+        communicator = await database_sync_to_async(self.communicator)(self.outsider)
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class SessionEventTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.student = User.objects.create_user(username='student', email='student@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host, num_questions=1), host=self.host)
+
+    def post(self, user, url, data=None):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url, data or {}, format='json')
+        return response, callbacks
+
+    def test_join_start_and_finish_each_queue_one_event(self):
+        base = f'/api/quiz-sessions/{self.session.id}'
+        response, callbacks = self.post(self.student, '/api/quiz-sessions/join/', {'room_code': self.session.room_code})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(callbacks), 1)
+        response, callbacks = self.post(self.host, f'{base}/start/')
+        self.assertEqual(len(callbacks), 1)
+        response, callbacks = self.post(self.host, f'{base}/finish/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(callbacks), 1)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'finished')
+
+    def test_only_host_can_finish(self):
+        response, _ = self.post(self.student, f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class LobbyVersionTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com')
+            for i in range(3)
+        ]
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        self.session.participants.add(self.host)
+        self.url = f'/api/quiz-sessions/{self.session.id}/status/'
+
+    def join(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/quiz-sessions/join/', {'room_code': self.session.room_code}, format='json')
+
+    def test_state_changes_bump_version(self):
+        self.join(self.students[0])
+        self.join(self.students[0])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.version, 1)
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/submit/', {'answers': {}}, format='json')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.version, 3)
+
+    def test_racing_join_by_the_same_user_is_not_an_error(self):
+        self.join(self.students[0])
+        # As if another worker inserted the row after this request's check.
+        with (
+            mock.patch('django.db.models.QuerySet.exists', return_value=False),
+            self.captureOnCommitCallbacks() as callbacks,
+        ):
+            response = self.join(self.students[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.version, 1)
+        self.assertEqual(self.session.participants.filter(pk=self.students[0].pk).count(), 1)
+
+    def test_unchanged_poll_returns_304(self):
+        self.client.force_authenticate(self.host)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.join(self.students[0])
+        self.client.force_authenticate(self.host)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_since_returns_only_new_participants(self):
+        self.join(self.students[0])
+        self.client.force_authenticate(self.host)
+        version = self.client.get(self.url).data['version']
+        self.join(self.students[1])
+        self.join(self.students[2])
+        self.client.force_authenticate(self.host)
+        response = self.client.get(self.url, {'since': version})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('quiz', response.data)
+        self.assertEqual(response.data['version'], version + 2)
+        self.assertEqual(
+            [p['username'] for p in response.data['participants']], ['student1', 'student2']
+        )
+
+    def test_since_must_be_an_integer(self):
+        self.client.force_authenticate(self.host)
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, 400)
+
+
+class HostQuizTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.client.force_authenticate(self.host)
+
+    def payload(self, num_questions, num_choices=4):
+        return {
+            'title': 'Bulk quiz',
+            'description': '',
+            'questions': [
+                {
+                    'text': f'Question {i}',
+                    'time_limit': 20,
+                    'choices': [{'text': f'Choice {j}', 'is_correct': j == 0} for j in range(num_choices)],
+                }
+                for i in range(num_questions)
+            ],
+        }
+
+    def count_queries(self, num_questions):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/quiz-sessions/host/', self.payload(num_questions), format='json')
+        self.assertEqual(response.status_code, 201)
+        return len(ctx.captured_queries), response
+
+    def test_host_quiz_creates_questions_and_choices(self):
+        _, response = self.count_queries(3)
+        data = response.json()
+        quiz = Quiz.objects.get(pk=data['quiz']['id'])
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertEqual(Choice.objects.filter(question__quiz=quiz).count(), 12)
+        self.assertEqual(Choice.objects.filter(question__quiz=quiz, is_correct=True).count(), 3)
+        self.assertEqual(len(data['quiz']['questions'][2]['choices']), 4)
+        self.assertEqual(data['participants'], [{'username': 'host'}])
+
+    def test_query_count_is_constant_in_quiz_size(self):
+        small, _ = self.count_queries(2)
+        large, _ = self.count_queries(50)
+        self.assertEqual(small, large)
+
+
+class RoomCodeTests(APITestCase):
+    def setUp(self):
+        room_codes._block.reset()
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+
+    def tearDown(self):
+        room_codes._block.reset()
+
+    def test_permutation_is_collision_free(self):
+        codes = {room_codes.encode(room_codes.permute(n)) for n in range(100_000)}
+        self.assertEqual(len(codes), 100_000)
+        self.assertTrue(all(len(code) == 6 for code in codes))
+
+    def test_allocated_codes_are_unique(self):
+        codes = [room_codes.allocate_room_code() for _ in range(250)]
+        self.assertEqual(len(set(codes)), 250)
+        self.assertEqual(RoomCodeSequence.objects.get().next_value, 300)
+
+    def test_skips_codes_held_by_active_sessions(self):
+        taken = room_codes.encode(room_codes.permute(0))
+        quiz = Quiz.objects.create(title='Legacy', owner=self.host, room_code=taken)
+        QuizSession.objects.create(quiz=quiz, host=self.host)
+        self.assertNotEqual(room_codes.allocate_room_code(), taken)
+
+    def test_finished_session_code_is_recycled_after_cooldown(self):
+        quiz = make_quiz(self.host)
+        session = QuizSession.objects.create(quiz=quiz, host=self.host)
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{session.id}/start/')
+        self.client.post(f'/api/quiz-sessions/{session.id}/finish/')
+        self.assertTrue(ReleasedRoomCode.objects.filter(code=session.room_code).exists())
+        self.assertNotEqual(room_codes.allocate_room_code(), session.room_code)
+
+        ReleasedRoomCode.objects.update(released_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(room_codes.allocate_room_code(), session.room_code)
+        self.assertFalse(ReleasedRoomCode.objects.exists())
+
+        new_session = QuizSession.objects.create(quiz=make_quiz(self.host, title='New'), host=self.host)
+        new_session.room_code = session.room_code
+        new_session.save()
+
+    def test_benchmark_command_runs(self):
+        out = StringIO()
+        call_command('bench_room_codes', in_use=200, released=5, allocations=50, stdout=out)
+        self.assertIn('50 allocations', out.getvalue())
+        self.assertFalse(QuizSession.objects.exists())
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class JoinLookupTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.student = User.objects.create_user(username='student', email='student@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        room_codes.forget_open_lobby(self.session.room_code)
+
+    def test_room_codes_are_stored_upper_case(self):
+        quiz = Quiz.objects.create(title='Lower', owner=self.host, room_code='abc123')
+        self.assertEqual(quiz.room_code, 'ABC123')
+
+    def test_lookup_is_exact_and_then_cached(self):
+        code = self.session.room_code.lower()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(room_codes.find_open_lobby(f' {code} '), self.session)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('UPPER', sql)
+        self.assertNotIn('LIKE', sql)
+        with CaptureQueriesContext(connection) as ctx:
+            room_codes.find_open_lobby(code)
+        self.assertIn(f'"id" = {self.session.id}', ctx.captured_queries[0]['sql'])
+
+    def test_join_is_case_insensitive(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(
+            '/api/quiz-sessions/join/', {'room_code': self.session.room_code.lower()}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.session.participants.filter(pk=self.student.pk).exists())
+
+    def test_start_closes_lobby_for_joins(self):
+        room_codes.find_open_lobby(self.session.room_code)
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.assertNotIn(self.session.room_code, room_codes._open_lobbies)
+        self.client.force_authenticate(self.student)
+        response = self.client.post('/api/quiz-sessions/join/', {'room_code': self.session.room_code}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class JoinQueueTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com')
+            for i in range(5)
+        ]
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        self.session.participants.add(self.host)
+        self.url = f'/api/quiz-sessions/{self.session.id}/status/'
+        # Flush by hand; the background flusher never wakes during a test.
+        self.queue = JoinQueue(enabled=True, interval=3600, state=InProcessStateBackend())
+        for target in ('quiz.views.join_queue', 'quiz.serializers.join_queue', 'quiz.engine.join_queue'):
+            patcher = mock.patch(target, self.queue)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def join(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/quiz-sessions/join/', {'room_code': self.session.room_code}, format='json')
+
+    def usernames(self, data):
+        return [participant['username'] for participant in data['participants']]
+
+    def test_join_is_acknowledged_before_the_row_is_written(self):
+        response = self.join(self.students[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.usernames(response.data), ['host', 'student0'])
+        self.assertFalse(self.session.participants.filter(pk=self.students[0].pk).exists())
+
+    def test_status_includes_pending_joins_and_changes_etag(self):
+        self.client.force_authenticate(self.host)
+        etag = self.client.get(self.url)['ETag']
+        self.join(self.students[0])
+        self.client.force_authenticate(self.host)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.usernames(response.data), ['host', 'student0'])
+        response = self.client.get(self.url, {'since': response.data['version']})
+        self.assertEqual(self.usernames(response.data), ['student0'])
+
+    def test_flush_writes_one_batch_per_session(self):
+        for student in self.students:
+            self.join(student)
+        self.join(self.students[0])
+        self.assertEqual(self.queue.pending_count(self.session.id), 5)
+        with self.assertNumQueries(5):  # savepoint, version bump + read, bulk insert, release
+            self.queue.flush()
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.version, 1)
+        self.assertEqual(self.session.participants.count(), 6)
+        self.assertEqual(
+            SessionParticipant.objects.filter(session=self.session, joined_version=1).count(), 5
+        )
+
+    def test_start_flushes_pending_joins(self):
+        self.join(self.students[0])
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'in_progress')
+        self.assertEqual(self.session.version, 2)
+        self.assertTrue(self.session.participants.filter(pk=self.students[0].pk).exists())
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class LiveGameTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com')
+            for i in range(3)
+        ]
+        self.quiz = make_quiz(self.host, num_questions=3)
+        self.session = QuizSession.objects.create(quiz=self.quiz, host=self.host)
+        self.session.participants.add(self.host, *self.students)
+        self.answers = correct_answers(self.quiz)
+        self.question_ids = sorted(int(q) for q in self.answers)
+        top_scores.invalidate()
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.session.refresh_from_db()
+        self.game = games.get(self.session)
+        self.addCleanup(games.pop, self.session.id)
+
+    def answer(self, user, question_id, choice_id):
+        self.client.force_authenticate(user)
+        return self.client.post(
+            f'/api/quiz-sessions/{self.session.id}/answer/',
+            {'question_id': question_id, 'choice_id': choice_id}, format='json',
+        )
+
+    def test_game_is_loaded_on_start(self):
+        self.assertIsNotNone(self.game)
+        self.assertEqual(self.game.question_ids, self.question_ids)
+        started = self.session.started_at.timestamp()
+        self.assertEqual(self.game.deadlines, [started + 30, started + 60, started + 90])
+        self.assertEqual(self.game.current_index(started + 45), 1)
+        self.assertTrue(self.game.is_over(started + 90))
+
+    def test_answers_are_scored_in_memory(self):
+        first = self.question_ids[0]
+        with self.assertNumQueries(1):  # the session lookup only
+            response = self.answer(self.students[0], first, self.answers[str(first)])
+        self.assertEqual(response.data, {'correct': True, 'score': 1})
+        response = self.answer(self.students[0], first, self.answers[str(first)])
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_open_question_accepts_answers(self):
+        second = self.question_ids[1]
+        response = self.answer(self.students[0], second, self.answers[str(second)])
+        self.assertEqual(response.status_code, 400)
+        started = self.session.started_at.timestamp()
+        self.assertTrue(self.game.answer(self.students[0].pk, second, self.answers[str(second)], now=started + 31))
+        with self.assertRaises(AnswerRejected):
+            self.game.answer(self.students[1].pk, second, self.answers[str(second)], now=started + 61)
+
+    def test_finish_persists_results_in_one_batch(self):
+        first = self.question_ids[0]
+        self.answer(self.students[0], first, self.answers[str(first)])
+        self.answer(self.students[1], first, -1)
+        self.client.force_authenticate(self.host)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertEqual(response.status_code, 200)
+        results = dict(QuizResult.objects.filter(quiz=self.quiz).values_list('user__username', 'score'))
+        self.assertEqual(results, {'student0': 1, 'student1': 0})
+        stats = PlayerScore.objects.get(user=self.students[0])
+        self.assertEqual((stats.total_score, stats.quizzes_played, stats.total_questions), (1, 1, 3))
+        self.assertEqual((stats.best_quiz_title, stats.best_percentage), ('Quiz', 33.33))
+        self.assertEqual(top_scores.top()[0], {'username': 'student0', 'total_score': 1})
+        self.assertIsNone(games.get(QuizSession.objects.get(pk=self.session.pk)))
+
+    def test_finish_from_a_worker_without_the_game(self):
+        first = self.question_ids[0]
+        self.answer(self.students[0], first, self.answers[str(first)])
+        # Another worker (or this one after a restart) has nothing in memory.
+        games.pop(self.session.id)
+        self.client.force_authenticate(self.host)
+        response = self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(QuizResult.objects.get(quiz=self.quiz).user, self.students[0])
+        self.assertEqual(get_state_backend().hash_get_all(self.game.scores_key), {})
+
+    def test_failed_finish_keeps_the_game(self):
+        self.client.force_authenticate(self.host)
+        with mock.patch.object(LiveGame, 'persist_results', side_effect=OperationalError('disk I/O error')):
+            with self.assertRaises(OperationalError):
+                self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertEqual(QuizSession.objects.get(pk=self.session.pk).status, 'in_progress')
+        self.assertIs(games.find(self.session.id), self.game)
+
+    def test_submitted_players_are_not_persisted_twice(self):
+        first = self.question_ids[0]
+        self.answer(self.students[0], first, self.answers[str(first)])
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/submit/', {'answers': self.answers}, format='json')
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertEqual(QuizResult.objects.filter(user=self.students[0]).count(), 1)
+        self.assertEqual(QuizResult.objects.get(user=self.students[0]).score, 3)
+
+
+    def test_second_start_is_rejected(self):
+        first = self.question_ids[0]
+        self.answer(self.students[0], first, self.answers[str(first)])
+        self.client.force_authenticate(self.host)
+        response = self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(QuizSession.objects.get(pk=self.session.pk).started_at, self.session.started_at)
+        self.assertEqual(self.answer(self.students[0], first, self.answers[str(first)]).status_code, 400)
+
+    def test_second_finish_is_rejected(self):
+        url = f'/api/quiz-sessions/{self.session.id}/finish/'
+        self.client.post(url)
+        version = QuizSession.objects.get(pk=self.session.pk).version
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(QuizSession.objects.get(pk=self.session.pk).version, version)
+
+    def test_finished_session_cannot_be_restarted(self):
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        # The released code taken by a new lobby.
+        QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host, room_code=self.session.room_code)
+        response = self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(QuizSession.objects.get(pk=self.session.pk).status, 'finished')
+
+
+class TimingWheelTests(TestCase):
+    def test_timers_fire_once_their_tick_has_passed(self):
+        wheel = TimingWheel(tick=1, size=8, now=100)
+        wheel.schedule(102.5, 'a')
+        wheel.schedule(102.9, 'b')
+        wheel.schedule(104, 'c')
+        self.assertEqual(wheel.advance(102.9), [])
+        self.assertEqual([item for _, item in wheel.advance(103)], ['a', 'b'])
+        self.assertEqual([item for _, item in wheel.advance(105.5)], ['c'])
+        self.assertEqual(len(wheel), 0)
+
+    def test_timers_beyond_one_revolution_wait_for_their_round(self):
+        wheel = TimingWheel(tick=1, size=8, now=100)
+        wheel.schedule(101.5, 'soon')
+        wheel.schedule(109.5, 'next round')  # same slot as 'soon'
+        self.assertEqual([item for _, item in wheel.advance(102)], ['soon'])
+        self.assertEqual(wheel.advance(109), [])
+        self.assertEqual([item for _, item in wheel.advance(110)], ['next round'])
+
+    def test_long_stall_and_past_deadlines(self):
+        wheel = TimingWheel(tick=1, size=8, now=100)
+        wheel.schedule(50, 'overdue')
+        for i in range(30):
+            wheel.schedule(101 + i, i)
+        self.assertEqual(len(wheel.advance(200)), 31)
+
+    def test_cancel(self):
+        wheel = TimingWheel(tick=1, size=8, now=100)
+        timer_id = wheel.schedule(101, 'x')
+        wheel.cancel(timer_id)
+        self.assertEqual(wheel.advance(110), [])
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class AdvanceGameTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host, num_questions=2), host=self.host)
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/start/')
+        self.game = games.find(self.session.id)
+        self.addCleanup(games.pop, self.session.id)
+        self.scheduler = mock.Mock(state=InProcessStateBackend())
+
+    def test_moves_to_next_question_and_arms_its_timer(self):
+        with mock.patch('quiz.scheduler.broadcast_session_event') as broadcast:
+            advance_game(self.scheduler, self.session.id, 0, self.game.deadlines[0])
+        broadcast.assert_called_once_with(
+            self.session.id, 'question_changed',
+            index=1, question_id=self.game.question_ids[1], deadline=self.game.deadlines[1],
+        )
+        self.scheduler.schedule.assert_called_once_with(self.game.deadlines[1], self.session.id, 1)
+
+    def test_finishes_the_session_after_the_last_question(self):
+        advance_game(self.scheduler, self.session.id, 1, self.game.deadlines[1])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'finished')
+        self.assertIsNone(games.find(self.session.id))
+        self.scheduler.schedule.assert_not_called()
+
+    @mock.patch.object(QuestionScheduler, '_ensure_running')
+    def test_overdue_game_is_taken_over_by_another_worker(self, ensure_running):
+        deadline = self.game.deadlines[0]
+        QuestionScheduler().schedule(deadline, self.session.id, 0)
+        self.addCleanup(QuestionScheduler().forget, self.session.id)
+        # The starting worker goes away; another one sweeps the state backend.
+        games.pop(self.session.id)
+        other = QuestionScheduler(tick=1, sweep_interval=5)
+        self.assertEqual(other.adopt_overdue(now=deadline + 1), 0)
+        self.assertEqual(other.adopt_overdue(now=deadline + 6), 1)
+        self.assertEqual(other.adopt_overdue(now=deadline + 7), 0)
+        self.assertEqual(other.wheel.advance(deadline + 8), [(deadline, (self.session.id, 0))])
+        with mock.patch('quiz.scheduler.broadcast_session_event') as broadcast:
+            advance_game(other, self.session.id, 0, deadline)
+            # A timer for the same question elsewhere finds it already advanced.
+            advance_game(other, self.session.id, 0, deadline)
+        broadcast.assert_called_once()
+        self.assertEqual(
+            get_state_backend().hash_get(schedule_key(self.session.id), 'deadline'), str(self.game.deadlines[1])
+        )
+
+    @mock.patch.object(QuestionScheduler, '_ensure_running')
+    def test_scheduler_with_its_own_state_leaves_the_shared_one_alone(self, ensure_running):
+        state = InProcessStateBackend()
+        QuestionScheduler(state=state).schedule(self.game.deadlines[0], self.session.id, 0)
+        self.assertEqual(state.set_members(LIVE_GAMES_KEY), {str(self.session.id)})
+        self.assertNotIn(str(self.session.id), get_state_backend().set_members(LIVE_GAMES_KEY))
+
+    def test_finish_forgets_the_timer(self):
+        with mock.patch.object(QuestionScheduler, '_ensure_running'):
+            QuestionScheduler().schedule(self.game.deadlines[0], self.session.id, 0)
+        self.client.post(f'/api/quiz-sessions/{self.session.id}/finish/')
+        self.assertNotIn(str(self.session.id), get_state_backend().set_members(LIVE_GAMES_KEY))
+        self.assertEqual(get_state_backend().hash_get_all(schedule_key(self.session.id)), {})
+
+    @override_settings(QUIZ_QUESTION_SCHEDULER=True)
+    def test_start_arms_the_scheduler(self):
+        session = QuizSession.objects.create(quiz=make_quiz(self.host, title='Other'), host=self.host)
+        self.addCleanup(games.pop, session.id)
+        with mock.patch('quiz.engine.question_scheduler') as scheduler:
+            self.client.post(f'/api/quiz-sessions/{session.id}/start/')
+        scheduler.schedule_game.assert_called_once_with(games.find(session.id))
+
+
+@override_settings(QUIZ_METRICS_ENABLED=True, QUIZ_QUESTION_SCHEDULER=False)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        self.client.force_authenticate(self.host)
+
+    def test_requests_are_recorded_per_action(self):
+        self.client.get(f'/api/quiz-sessions/{self.session.id}/status/')
+        self.client.get(f'/api/quiz-sessions/{self.session.id}/status/')
+        self.client.get('/api/quiz-sessions/leaderboard/')
+        self.client.post('/api/users/login/', {'username': 'nobody', 'password': 'x'}, format='json')
+
+        self.host.is_staff = True
+        self.host.save()
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('quiz_request_seconds_count{action="status"} 2', body)
+        self.assertIn('quiz_request_queries_count{action="leaderboard"} 1', body)
+        self.assertIn('quiz_request_db_seconds_count{action="login"} 1', body)
+        self.assertIn('# TYPE quiz_request_render_seconds histogram', body)
+
+    def test_query_counts_land_in_buckets(self):
+        histogram = metrics.Histogram(metrics.QUERY_BUCKETS)
+        for value in (0, 3, 4, 100):
+            histogram.observe(value)
+        lines = histogram.render('q', 'x')
+        self.assertIn('q_bucket{action="x",le="0"} 1', lines)
+        self.assertIn('q_bucket{action="x",le="3"} 2', lines)
+        self.assertIn('q_bucket{action="x",le="5"} 3', lines)
+        self.assertIn('q_bucket{action="x",le="+Inf"} 4', lines)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+
+class QuizContentCacheTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.quiz = make_quiz(self.host, num_questions=3)
+        self.session = QuizSession.objects.create(quiz=self.quiz, host=self.host)
+        self.client.force_authenticate(self.host)
+        self.url = f'/api/quiz-sessions/{self.session.id}/status/'
+
+    def test_rendered_body_matches_serializer(self):
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        expected = json.loads(json.dumps(QuizDetailSerializer(quiz).data))
+        self.assertEqual(self.client.get(self.url).json()['quiz'], expected)
+
+    def test_quiz_body_is_rendered_once(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse(any('quiz_question' in q['sql'] for q in ctx.captured_queries))
+
+    def test_editing_content_invalidates_body(self):
+        self.client.get(self.url)
+        question = self.quiz.questions.first()
+        question.text = 'Edited'
+        question.save()
+        texts = [q['text'] for q in self.client.get(self.url).json()['quiz']['questions']]
+        self.assertIn('Edited', texts)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=10, sizeof=len)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.get('a')
+        cache.set('c', b'123')
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.currsize, 8)
+        cache.set('huge', b'x' * 11)
+        self.assertNotIn('huge', cache)
+
+    def test_renderer_splices_fragments(self):
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            body = renderer.render({'a': JSONFragment(b'{"x":[1,2]}'), 'b': 'text'})
+            self.assertEqual(json.loads(body), {'a': {'x': [1, 2]}, 'b': 'text'})
+
+    def test_browsable_api_renders_session_with_cached_quiz(self):
+        url = f'/api/quiz-sessions/{self.session.id}/'
+        self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Question', response.content)
+
+
+class FastJSONTests(TestCase):
+    def test_output_matches_stdlib_renderer(self):
+        data = {
+            'text': 'caf\u00e9 \u2028', 'n': Decimal('1.50'), 'nested': [{'a': None}], 1: True,
+            'floats': [0.1, -2.75, 3.0, 66.66666666666667, 0.0001, 1e15],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_floats_in_exponent_notation_decode_to_the_same_values(self):
+        # The documented difference: exponents are spelt differently.
+        data = {'floats': [1e16, 1e-05, 1.5e-07, -1.2345678901234568e+17]}
+        fast, stdlib = FastJSONRenderer().render(data), JSONRenderer().render(data)
+        self.assertEqual(fast, b'{"floats":[1e16,0.00001,1.5e-7,-1.2345678901234568e17]}')
+        self.assertEqual(json.loads(fast), json.loads(stdlib))
+
+    def test_datetimes_match_stdlib_renderer(self):
+        aware = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        data = {'aware': aware, 'naive': aware.replace(tzinfo=None), 'offset': aware.astimezone(
+            dt_timezone(timedelta(hours=2))), 'date': aware.date(), 'time': aware.time()}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_integers_beyond_64_bits_fall_back_to_stdlib(self):
+        data = {'big': 2 ** 70, 'js_unsafe': 2 ** 60 + 1}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_nan_renders_as_null(self):
+        # The documented difference: the strict stdlib renderer refuses NaN.
+        self.assertEqual(FastJSONRenderer().render({'x': float('nan')}), b'{"x":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'x': float('nan')})
+
+    def test_indent_falls_back_to_stdlib(self):
+        body = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(body, b'{\n  "a": 1\n}')
+
+    def test_parser(self):
+        self.assertEqual(FastJSONParser().parse(BytesIO('{"a": ["é"]}'.encode())), {'a': ['é']})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a":'))
+
+
+class SessionListTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.other = User.objects.create_user(username='other', email='other@example.com')
+        self.client.force_authenticate(self.host)
+        self.sessions = []
+        for i in range(5):
+            host = self.host if i % 2 == 0 else self.other
+            session = QuizSession.objects.create(quiz=make_quiz(host, title=f'Quiz {i}'), host=host)
+            session.participants.add(host)
+            self.sessions.append(session)
+        self.sessions[0].participants.add(self.other)
+        QuizSession.objects.filter(pk=self.sessions[1].pk).update(status='finished')
+
+    def test_list_rows_are_slim(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/quiz-sessions/')
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()['results']
+        self.assertEqual([row['id'] for row in rows], [s.pk for s in reversed(self.sessions)])
+        oldest = rows[-1]
+        self.assertEqual(oldest['quiz_title'], 'Quiz 0')
+        self.assertEqual(oldest['participant_count'], 2)
+        self.assertEqual(set(oldest), {'id', 'room_code', 'status', 'participant_count', 'quiz_title', 'created_at'})
+
+    def test_cursor_pagination(self):
+        response = self.client.get('/api/quiz-sessions/', {'page_size': 2})
+        seen = []
+        while True:
+            data = response.json()
+            seen += [row['id'] for row in data['results']]
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(seen, [s.pk for s in reversed(self.sessions)])
+
+    def test_filters(self):
+        response = self.client.get('/api/quiz-sessions/', {'status': 'finished'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.sessions[1].pk])
+        response = self.client.get('/api/quiz-sessions/', {'host': self.other.pk})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.sessions[3].pk, self.sessions[1].pk])
+        self.assertEqual(self.client.get('/api/quiz-sessions/', {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/quiz-sessions/', {'host': 'x'}).status_code, 400)
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class QueryCountTests(APITestCase):
+    """
+    The session actions cost the same number of queries whatever the size of
+    the quiz and the lobby.
+    """
+
+    def make_session(self, num_questions, num_choices, num_participants):
+        host = User.objects.create_user(username=f'host{num_participants}', email=f'host{num_participants}@example.com')
+        session = QuizSession.objects.create(quiz=make_quiz(host, num_questions, num_choices), host=host)
+        session.participants.add(host, *[
+            User.objects.create_user(username=f'p{num_participants}-{i}', email=f'p{num_participants}-{i}@example.com')
+            for i in range(num_participants)
+        ])
+        # Render the quiz body up front; its cost is covered by QuizContentCacheTests.
+        quiz_body(session.quiz_id)
+        return session
+
+    def count(self, user, method, url, data=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return len(ctx.captured_queries)
+
+    def run_session(self, num_questions, num_choices, num_participants):
+        session = self.make_session(num_questions, num_choices, num_participants)
+        player = User.objects.create_user(username=f'player{num_participants}', email=f'player{num_participants}@example.com')
+        answers = correct_answers(session.quiz)
+        url = f'/api/quiz-sessions/{session.pk}'
+        return {
+            'status': self.count(session.host, 'get', f'{url}/status/'),
+            'join': self.count(player, 'post', '/api/quiz-sessions/join/', {'room_code': session.room_code}),
+            'start': self.count(session.host, 'post', f'{url}/start/'),
+            'submit': self.count(player, 'post', f'{url}/submit/', {'answers': answers}),
+        }
+
+    def test_query_counts_are_fixed(self):
+        small = self.run_session(num_questions=1, num_choices=2, num_participants=1)
+        large = self.run_session(num_questions=20, num_choices=6, num_participants=40)
+        self.assertEqual(small, large)
+        # status: version, session + host, participants.
+        # join: lobby + host, membership check, version bump (2), insert, participants, savepoint (2),
+        # inner savepoint around the bump and insert (2).
+        # start: session, status update, version bump (2), questions, answer key, roster, savepoint (2).
+        # submit: session, result, PlayerScore (update, insert, update, read), version bump (2),
+        # savepoint (2); the answer key was compiled by start.
+        self.assertEqual(small, {'status': 3, 'join': 10, 'start': 9, 'submit': 10})
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.player = User.objects.create_user(username='player', email='player@example.com')
+        self.long_ago = timezone.now() - timedelta(days=90)
+
+    def make_session(self, status='finished', finished_at=None):
+        session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host, status=status)
+        session.participants.add(self.host, self.player)
+        QuizSession.objects.filter(pk=session.pk).update(finished_at=finished_at)
+        return session
+
+    def test_archives_old_finished_sessions(self):
+        old = self.make_session(finished_at=self.long_ago)
+        QuizResult.objects.create(user=self.player, quiz=old.quiz, score=2, total_questions=3)
+        recent = self.make_session(finished_at=timezone.now())
+        lobby = self.make_session(status='lobby')
+
+        self.assertEqual(archive_batch(archive_cutoff(30)), 1)
+
+        archived = ArchivedSession.objects.get()
+        self.assertEqual(archived.session_id, old.pk)
+        self.assertEqual((archived.quiz_title, archived.room_code, archived.host), ('Quiz', old.room_code, self.host))
+        self.assertEqual((archived.question_count, archived.participant_count), (3, 2))
+        self.assertEqual([result[:3] for result in archived.results], [[self.player.pk, 2, 3]])
+        self.assertFalse(Quiz.objects.filter(pk=old.quiz_id).exists())
+        self.assertFalse(Question.objects.filter(quiz_id=old.quiz_id).exists())
+        self.assertFalse(SessionParticipant.objects.filter(session_id=old.pk).exists())
+        self.assertFalse(QuizResult.objects.filter(quiz_id=old.quiz_id).exists())
+        self.assertEqual(set(QuizSession.objects.values_list('pk', flat=True)), {recent.pk, lobby.pk})
+
+        # The leaderboard keeps archived points, also across a rebuild.
+        self.assertEqual(PlayerScore.objects.get(user=self.player).total_score, 2)
+        rebuild_player_scores()
+        self.assertEqual(PlayerScore.objects.get(user=self.player).total_score, 2)
+
+    def test_archiving_leaves_player_scores_unchanged(self):
+        for score in (1, 3):
+            session = self.make_session(finished_at=self.long_ago)
+            QuizResult.objects.create(user=self.player, quiz=session.quiz, score=score, total_questions=3)
+        before = PlayerScore.objects.filter(user=self.player).values(*STAT_FIELDS).get()
+        self.assertEqual(archive_batch(archive_cutoff(30)), 2)
+        self.assertFalse(QuizResult.objects.exists())
+        self.assertEqual(PlayerScore.objects.filter(user=self.player).values(*STAT_FIELDS).get(), before)
+
+    def test_batches_resume_where_they_stopped(self):
+        sessions = [self.make_session(finished_at=self.long_ago) for _ in range(3)]
+        cutoff = archive_cutoff(30)
+        self.assertEqual(archive_batch(cutoff, batch_size=2), 2)
+        self.assertEqual(archive_batch(cutoff, batch_size=2), 1)
+        self.assertEqual(archive_batch(cutoff, batch_size=2), 0)
+        self.assertEqual(
+            list(ArchivedSession.objects.order_by('session_id').values_list('session_id', flat=True)),
+            [session.pk for session in sessions],
+        )
+
+    def test_command(self):
+        self.make_session(finished_at=self.long_ago)
+        out = StringIO()
+        call_command('archive_sessions', '--dry-run', stdout=out)
+        self.assertIn('1 finished sessions', out.getvalue())
+        call_command('archive_sessions', stdout=out)
+        self.assertEqual(ArchivedSession.objects.count(), 1)
+        self.assertFalse(QuizSession.objects.exists())
+
+
+def _increment_shared_counter(path, times):
+    backend = SQLiteStateBackend(path)
+    for _ in range(times):
+        backend.hash_incr('counter', 'n')
+
+
+class StateBackendContract:
+    """
+    Behaviour every session-state backend must share; mixed into one
+    TestCase per backend.
+    """
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.state = self.make_backend()
+
+    def test_hashes(self):
+        self.assertTrue(self.state.hash_set_new('h', 1, 'a'))
+        self.assertFalse(self.state.hash_set_new('h', 1, 'b'))
+        self.assertEqual(self.state.hash_incr('h', 'n', 2), 2)
+        self.assertEqual(self.state.hash_incr('h', 'n'), 3)
+        self.state.hash_update('h', {'x': 5})
+        self.assertEqual(self.state.hash_get('h', 'x'), '5')
+        self.assertIsNone(self.state.hash_get('h', 'missing'))
+        self.assertEqual(self.state.hash_len('h'), 3)
+        self.assertEqual(self.state.hash_pop_all('h'), {'1': 'a', 'n': '3', 'x': '5'})
+        self.assertEqual(self.state.hash_get_all('h'), {})
+
+    def test_sets(self):
+        self.assertEqual(self.state.set_add('s', 1, 2), 2)
+        self.assertEqual(self.state.set_add('s', 2, 3), 1)
+        self.state.set_remove('s', 1)
+        self.assertEqual(self.state.set_members('s'), {'2', '3'})
+        self.state.delete('s')
+        self.assertEqual(self.state.set_members('s'), set())
+
+
+class InProcessStateBackendTests(StateBackendContract, TestCase):
+    def make_backend(self):
+        return InProcessStateBackend()
+
+
+class SQLiteStateBackendTests(StateBackendContract, TestCase):
+    def make_backend(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'state.sqlite3')
+        return SQLiteStateBackend(self.path)
+
+    def test_atomic_across_processes(self):
+        processes = [
+            multiprocessing.get_context('fork').Process(target=_increment_shared_counter, args=(self.path, 200))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.state.hash_get('counter', 'n'), '600')
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisStateBackendTests(StateBackendContract, TestCase):
+    def make_backend(self):
+        return RedisStateBackend(client=fakeredis.FakeRedis(), ttl=60)
+
+    def test_writes_set_a_ttl(self):
+        self.state.hash_incr('h', 'n')
+        self.assertEqual(self.state.client.ttl('quiz:h'), 60)
+
+
+@override_settings(QUIZ_QUESTION_SCHEDULER=False)
+class SharedStateTests(APITestCase):
+    """
+    Two workers of one room, each with its own backend object, sharing a
+    SQLite state file.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'state.sqlite3')
+        self.workers = [SQLiteStateBackend(path), SQLiteStateBackend(path)]
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com') for i in range(2)
+        ]
+        self.session = QuizSession.objects.create(
+            quiz=make_quiz(self.host), host=self.host, status='in_progress', started_at=timezone.now()
+        )
+        self.session.participants.add(self.host, *self.students)
+
+    def test_live_game_answers_are_shared(self):
+        games_ = [LiveGame.load(self.session) for _ in self.workers]
+        for game, state in zip(games_, self.workers):
+            game.state = state
+        answers = correct_answers(self.session.quiz)
+        first = games_[0].question_ids[0]
+        self.assertTrue(games_[0].answer(self.students[0].pk, first, answers[str(first)]))
+        with self.assertRaises(AnswerRejected):
+            games_[1].answer(self.students[0].pk, first, answers[str(first)])
+        games_[1].answer(self.students[1].pk, first, -1)
+        self.assertEqual(games_[1].score_of(self.students[0].pk), 1)
+        games_[1].persist_results()
+        self.assertEqual(
+            dict(QuizResult.objects.values_list('user__username', 'score')), {'student0': 1, 'student1': 0}
+        )
+
+    def test_join_queue_is_shared(self):
+        QuizSession.objects.filter(pk=self.session.pk).update(status='lobby')
+        newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com')
+        queues = [JoinQueue(enabled=True, interval=3600, state=state) for state in self.workers]
+        self.assertTrue(queues[0].add(self.session.pk, newcomer))
+        self.assertFalse(queues[1].add(self.session.pk, newcomer))
+        self.assertFalse(queues[1].add(self.session.pk, self.students[0]))
+        self.assertEqual(queues[1].pending(self.session.pk), ['newcomer'])
+        queues[1].flush()
+        self.assertEqual(queues[0].pending_count(self.session.pk), 0)
+        self.assertTrue(self.session.participants.filter(pk=newcomer.pk).exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    # Committed data, so the replica connection (a test mirror of the
+    # primary) can read it.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        pin_cache().clear()
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.student = User.objects.create_user(username='student', email='student@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        self.session.participants.add(self.host)
+        quiz_body(self.session.quiz_id)
+
+    def queries_by_alias(self, user, method, url, data=None):
+        self.client.force_authenticate(user)
+        with (
+            CaptureQueriesContext(connections['default']) as primary,
+            CaptureQueriesContext(connections['replica']) as replica,
+        ):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return len(primary.captured_queries), len(replica.captured_queries)
+
+    def test_hot_reads_go_to_the_replica(self):
+        status_url = f'/api/quiz-sessions/{self.session.pk}/status/'
+        self.assertEqual(self.queries_by_alias(self.host, 'get', status_url), (0, 3))
+        self.assertEqual(self.queries_by_alias(self.host, 'get', '/api/quiz-sessions/'), (0, 1))
+        primary, replica = self.queries_by_alias(self.host, 'get', '/api/users/me/stats/')
+        self.assertEqual((primary, replica), (1, 0))
+
+    def test_writers_are_pinned_to_the_primary(self):
+        status_url = f'/api/quiz-sessions/{self.session.pk}/status/'
+        primary, replica = self.queries_by_alias(
+            self.student, 'post', '/api/quiz-sessions/join/', {'room_code': self.session.room_code}
+        )
+        self.assertEqual(replica, 0)
+        self.assertEqual(self.queries_by_alias(self.student, 'get', status_url), (3, 0))
+        # Other users are not pinned by the student's write.
+        self.assertEqual(self.queries_by_alias(self.host, 'get', status_url), (0, 3))
+        pin_cache().clear()
+        self.assertEqual(self.queries_by_alias(self.student, 'get', status_url), (0, 3))
+
+
+class SQLiteProfileTests(APITestCase):
+    def test_pragmas_are_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({'default': sqlite_database(os.path.join(directory, 'db.sqlite3'))})
+            writer, reader = handler.create_connection('default'), handler.create_connection('default')
+            try:
+                with writer.cursor() as cursor:
+                    self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                    self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+                    self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -32000)
+                    cursor.execute('CREATE TABLE t (x INTEGER)')
+                # With WAL a reader is not blocked by an open write transaction.
+                writer.set_autocommit(False)
+                writer.cursor().execute('INSERT INTO t VALUES (1)')
+                with reader.cursor() as cursor:
+                    self.assertEqual(cursor.execute('SELECT COUNT(*) FROM t').fetchone()[0], 0)
+                writer.commit()
+            finally:
+                writer.close()
+                reader.close()
+
+    @override_settings(SQLITE_BUSY_RETRIES=2)
+    def test_retry_on_busy(self):
+        locked = OperationalError('database is locked')
+        with mock.patch('quiz_backend.sqlite.time.sleep') as sleep, self.assertLogs('quiz_backend.sqlite'):
+            func = mock.Mock(side_effect=[locked, locked, 'done'])
+            self.assertEqual(retry_on_busy(func, 1, key='value'), 'done')
+            self.assertEqual(func.call_count, 3)
+            func.assert_called_with(1, key='value')
+            # Backoff doubles, with jitter.
+            first, second = (call.args[0] for call in sleep.call_args_list)
+            self.assertTrue(0.0125 <= first <= 0.0375 and 0.025 <= second <= 0.075)
+
+            func = mock.Mock(side_effect=locked)
+            with self.assertRaises(OperationalError):
+                retry_on_busy(func)
+            self.assertEqual(func.call_count, 3)
+
+            func = mock.Mock(side_effect=OperationalError('no such table: t'))
+            with self.assertRaises(OperationalError):
+                retry_on_busy(func)
+            self.assertEqual(func.call_count, 1)
+
+    def test_write_queue_is_fifo_and_reentrant(self):
+        queue = WriteQueue()
+        order = []
+
+        def write(i):
+            with queue:
+                order.append(i)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(5)]
+        with queue:
+            with queue:
+                for i, thread in enumerate(threads):
+                    thread.start()
+                    # Let each thread take its ticket before starting the next.
+                    while queue._next_ticket < i + 2:
+                        time.sleep(0.001)
+            self.assertEqual(order, [])
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_join_is_retried_when_the_database_is_locked(self):
+        host = User.objects.create_user(username='host', email='host@example.com')
+        student = User.objects.create_user(username='student', email='student@example.com')
+        session = QuizSession.objects.create(quiz=make_quiz(host), host=host)
+        self.client.force_authenticate(student)
+        lobby = QuizSession.objects.for_detail(participants=False).get(pk=session.pk)
+        with (
+            mock.patch('quiz.views.find_open_lobby', side_effect=[OperationalError('database is locked'), lobby]),
+            mock.patch('quiz_backend.sqlite.time.sleep'),
+            self.assertLogs('quiz_backend.sqlite', 'WARNING'),
+        ):
+            response = self.client.post('/api/quiz-sessions/join/', {'room_code': session.room_code}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(session.participants.filter(pk=student.pk).exists())
+
+
+class LongPollStatusTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.student = User.objects.create_user(username='student', email='student@example.com')
+        self.session = QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host)
+        self.session.participants.add(self.host)
+        self.url = f'/api/quiz-sessions/{self.session.pk}/status/wait/'
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.host).key}'}
+
+    def join(self):
+        version = self.session.bump_version()
+        SessionParticipant.objects.create(session=self.session, user=self.student, joined_version=version)
+
+    async def test_returns_at_once_when_the_lobby_changed(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['room_code'], self.session.room_code)
+        self.assertEqual(response['ETag'], self.session.etag)
+
+    async def test_times_out_with_not_modified(self):
+        headers = {**self.headers, 'If-None-Match': self.session.etag}
+        response = await self.async_client.get(self.url, {'timeout': '0.05'}, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(session_waiters), 0)
+
+    async def test_wakes_up_when_someone_joins(self):
+        etag = self.session.etag
+        headers = {**self.headers, 'If-None-Match': etag}
+        request = asyncio.ensure_future(self.async_client.get(self.url, {'timeout': '10'}, headers=headers))
+        while not len(session_waiters):
+            await asyncio.sleep(0.001)
+        await sync_to_async(self.join)()
+        session_waiters.notify(self.session.pk)
+        response = await asyncio.wait_for(request, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('student', [p['username'] for p in response.json()['participants']])
+        self.assertNotEqual(response['ETag'], etag)
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'timeout': 'soon'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_rejects_timeouts_that_are_not_finite(self):
+        headers = {**self.headers, 'If-None-Match': self.session.etag}
+        for timeout in ('nan', 'inf', '-inf'):
+            response = await self.async_client.get(self.url, {'timeout': timeout}, headers=headers)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(session_waiters), 0)
+
+    def test_lobby_is_rendered_once_per_change(self):
+        body, etag = lobby_body(self.session.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(lobby_body(self.session.pk), (body, etag))
+        self.join()
+        new_body, new_etag = lobby_body(self.session.pk)
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn(b'student', new_body)
+
+    def test_events_wake_waiters_on_commit(self):
+        with mock.patch.object(session_waiters, 'notify') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                broadcast_session_event(self.session.pk, 'participant_joined', username='student')
+                notify.assert_not_called()
+        notify.assert_called_once_with(self.session.pk)
+
+
+class WriteThrottleTests(APITestCase):
+    RATES = {'join_user': '2/min', 'join_room': '3/min', 'submit_user': '100/min', 'submit_room': '2/min'}
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.now = 1_000.0
+        for patcher in (
+            mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', self.RATES),
+            mock.patch.object(TokenBucketThrottle, 'timer', lambda throttle: self.now),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.host = User.objects.create_user(username='host', email='host@example.com')
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@example.com') for i in range(4)
+        ]
+        self.sessions = [QuizSession.objects.create(quiz=make_quiz(self.host), host=self.host) for _ in range(2)]
+
+    def join(self, user, session):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/quiz-sessions/join/', {'room_code': session.room_code.lower()}, format='json')
+
+    def test_user_bucket_refills_over_time(self):
+        student = self.students[0]
+        self.assertEqual(self.join(student, self.sessions[0]).status_code, 200)
+        self.assertEqual(self.join(student, self.sessions[1]).status_code, 200)
+        response = self.join(student, self.sessions[0])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.now += 30
+        self.assertEqual(self.join(student, self.sessions[0]).status_code, 200)
+
+    def test_room_bucket_does_not_limit_other_rooms(self):
+        for student in self.students[:3]:
+            self.assertEqual(self.join(student, self.sessions[0]).status_code, 200)
+        self.assertEqual(self.join(self.students[3], self.sessions[0]).status_code, 429)
+        self.assertEqual(self.join(self.students[3], self.sessions[1]).status_code, 200)
+
+    def test_default_rates_admit_a_lobby_filling_at_once(self):
+        players = User.objects.bulk_create([
+            User(username=f'burst{i}', email=f'burst{i}@example.com') for i in range(300)
+        ])
+        rates = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates):
+            statuses = {self.join(player, self.sessions[0]).status_code for player in players}
+        self.assertEqual(statuses, {200})
+
+    def test_default_rates_admit_a_room_submitting_at_once(self):
+        players = User.objects.bulk_create([
+            User(username=f'burst{i}', email=f'burst{i}@example.com') for i in range(300)
+        ])
+        url = f'/api/quiz-sessions/{self.sessions[0].pk}/submit/'
+        rates = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+        statuses = set()
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates):
+            for player in players:
+                self.client.force_authenticate(player)
+                statuses.add(self.client.post(url, {}, format='json').status_code)
+        self.assertEqual(statuses, {200})
+
+    def test_batched_joins_skip_the_room_bucket(self):
+        with mock.patch.object(join_queue, 'enabled', True), mock.patch.object(join_queue, 'add'):
+            for student in self.students:
+                self.assertEqual(self.join(student, self.sessions[0]).status_code, 200)
+
+    def test_submissions_are_limited_per_room(self):
+        for student, expected in zip(self.students, (200, 200, 429)):
+            self.client.force_authenticate(student)
+            response = self.client.post(f'/api/quiz-sessions/{self.sessions[0].pk}/submit/', {}, format='json')
+            self.assertEqual(response.status_code, expected)
+        response = self.client.post(f'/api/quiz-sessions/{self.sessions[1].pk}/submit/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_beyond_the_concurrency_limit_are_shed(self):
+        self.assertEqual(self.join(self.students[0], self.sessions[0]).status_code, 200)
+        self.assertEqual(write_admission.active, 0)
+        with mock.patch.object(write_admission, 'active', 32):
+            response = self.join(self.students[1], self.sessions[0])
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1')
+            # Reads are never shed.
+            response = self.client.get(f'/api/quiz-sessions/{self.sessions[0].pk}/status/')
+            self.assertEqual(response.status_code, 200)
 
-# Create your tests here.
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from .join_queue import join_queue
+from .models import normalize_room_code
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket over DRF's throttle rates: a rate of 'N/period' allows a
+    burst of N requests and refills N tokens per period.
+
+    Each check is one cache read and at most one write of (tokens,
+    timestamp), whatever the rate, where SimpleRateThrottle keeps and
+    trims a list of request times. Buckets live in the QUIZ_THROTTLE_CACHE
+    cache; point it at a shared backend to share them across workers. As
+    with DRF's own throttles, requests racing for one bucket may overspend
+    it slightly.
+    """
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'QUIZ_THROTTLE_CACHE', 'default')]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated) * self.num_requests / self.duration)
+        if tokens < 1:
+            self.shortfall = 1 - tokens
+            return False
+        # A bucket left alone for a full period is full again, so it may expire.
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return self.shortfall * self.duration / self.num_requests
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per user, e.g. against a client stuck in a retry loop.
+    """
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class JoinUserThrottle(UserBucketThrottle):
+    scope = 'join_user'
+
+
+class SubmitUserThrottle(UserBucketThrottle):
+    scope = 'submit_user'
+
+
+class JoinRoomThrottle(TokenBucketThrottle):
+    """
+    One bucket per room code, so a single huge or misbehaving room cannot
+    take every write the node can do. Not applied when joins are batched
+    (quiz.join_queue): a room's joins then cost one insert per flush
+    however many players arrive.
+    """
+
+    scope = 'join_room'
+
+    def get_cache_key(self, request, view):
+        if join_queue.enabled:
+            return None
+        room_code = request.data.get('room_code')
+        if not room_code:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': normalize_room_code(room_code)}
+
+
+class SubmitRoomThrottle(TokenBucketThrottle):
+    """
+    One bucket per session (the room a submission is for).
+    """
+
+    scope = 'submit_room'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': view.kwargs.get('pk')}
@@ -1,9 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuizSessionViewSet # Use the correct ViewSet name
+from .views import QuizSessionViewSet, lobby_status_wait # Use the correct ViewSet name
 
 router = DefaultRouter()
 # Register the QuizSessionViewSet, which handles all quiz session logic
 router.register(r'', QuizSessionViewSet, basename='quizsession')
 
-urlpatterns = router.urls
+urlpatterns = [
+    # Long-poll lobby status; an async view, see lobby_status_wait.
+    path('<int:pk>/status/wait/', lobby_status_wait, name='lobby_status_wait'),
+] + router.urls
@@ -1,12 +1,36 @@
-from django.db.models import Sum
+import asyncio
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
 from django.contrib.auth import get_user_model
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from .models import Quiz, Choice, QuizResult, QuizSession
+from quiz_backend.db_router import replica_reads
+from quiz_backend.sqlite import serialized_write
+from users.authentication import get_token_user
+from .models import Quiz, QuizResult, QuizSession, SessionParticipant, participants_prefetch
+from .engine import AnswerRejected, InvalidTransition, finish_session, games, start_session
+from .content import lobby_body, lobby_etag
+from .events import broadcast_session_event, session_waiters
+from .join_queue import join_queue
+from .pagination import SessionCursorPagination
+from .leaderboard import top_scores
+from .throttling import JoinRoomThrottle, JoinUserThrottle, SubmitRoomThrottle, SubmitUserThrottle
+from .room_codes import find_open_lobby
+from .scoring import get_answer_key
 from .serializers import (
     QuizCreateSerializer,
     QuizSessionSerializer,
+    QuizSessionListSerializer,
+    QuizSessionDeltaSerializer,
     LeaderboardSerializer
 )
 
@@ -18,31 +42,79 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
     """
     queryset = QuizSession.objects.all()
     serializer_class = QuizSessionSerializer
+    lookup_value_regex = r'\d+'
+    pagination_class = SessionCursorPagination
+
+    def get_queryset(self):
+        """
+        Shapes the queryset for the action being served; the query counts are
+        pinned by QueryCountTests.
+        """
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return self.filter_list(queryset.for_list())
+        if self.action == 'retrieve':
+            return queryset.for_detail()
+        if self.action == 'lobby_status':
+            # A delta poll only loads the new participants (see lobby_status).
+            return queryset.for_detail(participants='since' not in self.request.query_params)
+        if self.action in ('start_game', 'finish_game', 'answer', 'submit'):
+            return queryset.for_update()
+        return queryset
+
+    def filter_list(self, queryset):
+        """
+        Applies `?status=` and `?host=<user id>`. Both filters and the cursor
+        ordering are covered by the (status, created_at) and (host,
+        created_at) indexes.
+        """
+        status_filter = self.request.query_params.get('status')
+        if status_filter is not None:
+            if status_filter not in dict(QuizSession.STATUS_CHOICES):
+                raise ValidationError({'error': 'Unknown session status.'})
+            queryset = queryset.filter(status=status_filter)
+        host = self.request.query_params.get('host')
+        if host is not None:
+            if not host.isdigit():
+                raise ValidationError({'error': 'host must be a user id.'})
+            queryset = queryset.filter(host_id=int(host))
+        return queryset
+
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def get_serializer_class(self):
         # Use a different serializer for the 'host_quiz' action
         if self.action == 'host_quiz':
             return QuizCreateSerializer
+        if self.action == 'list':
+            return QuizSessionListSerializer
         return QuizSessionSerializer
 
     @action(detail=False, methods=['post'], url_path='host')
+    @serialized_write
     def host_quiz(self, request):
         """
         Creates a new Quiz and a QuizSession (lobby).
         """
         create_serializer = self.get_serializer(data=request.data)
         create_serializer.is_valid(raise_exception=True)
-        quiz = create_serializer.save(owner=request.user)
-        
-        # Create a new session for the quiz
-        session = QuizSession.objects.create(quiz=quiz, host=request.user)
-        session.participants.add(request.user)
+
+        # The quiz, its session and the host's participant row commit together.
+        with transaction.atomic():
+            quiz = create_serializer.save(owner=request.user)
+            session = QuizSession.objects.create(quiz=quiz, host=request.user)
+            session.participants.add(request.user)
         
-        # Use the standard session serializer for the response
+        # Use the standard session serializer for the response; the quiz body
+        # is rendered (once, in a fixed number of queries) by quiz.content.
+        session = QuizSession.objects.for_detail().get(pk=session.pk)
         session_serializer = QuizSessionSerializer(session)
         return Response(session_serializer.data, status=status.HTTP_201_CREATED)
 
-    @action(detail=False, methods=['post'], url_path='join')
+    @action(detail=False, methods=['post'], url_path='join', throttle_classes=[JoinUserThrottle, JoinRoomThrottle])
+    @serialized_write
     def join_session(self, request):
         """
         Allows a user to join an existing lobby using a room code.
@@ -52,74 +124,193 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Room code is required.'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            session = QuizSession.objects.get(room_code__iexact=room_code, status='lobby')
-            session.participants.add(request.user)
+            session = find_open_lobby(room_code)
+            if join_queue.enabled:
+                # Acknowledge from the in-memory roster; the row is written in the next batch.
+                if join_queue.add(session.id, request.user):
+                    broadcast_session_event(session.id, 'participant_joined', username=request.user.username)
+            else:
+                with transaction.atomic():
+                    if not session.participants.filter(pk=request.user.pk).exists():
+                        try:
+                            # A concurrent join by the same user may insert first;
+                            # the savepoint then undoes this request's version bump.
+                            with transaction.atomic():
+                                version = session.bump_version()
+                                SessionParticipant.objects.create(
+                                    session=session, user=request.user, joined_version=version
+                                )
+                        except IntegrityError:
+                            session.refresh_from_db(fields=['version'])
+                        else:
+                            broadcast_session_event(session.id, 'participant_joined', username=request.user.username)
+            prefetch_related_objects([session], participants_prefetch())
             serializer = self.get_serializer(session)
             return Response(serializer.data)
         except QuizSession.DoesNotExist:
             return Response({'error': 'Invalid room code or the lobby is closed.'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['get'], url_path='status')
+    @replica_reads
     def lobby_status(self, request, pk=None):
         """
         Periodically checked by the frontend to get lobby updates.
+
+        The response carries the session's state version as an ETag, so a
+        poll with a matching If-None-Match costs one primary-key lookup and
+        returns 304. With `?since=<version>`, only participants who joined
+        after that version are returned.
         """
+        version = QuizSession.objects.filter(pk=pk).values_list('version', flat=True).first()
+        if version is not None:
+            etag = QuizSession.make_etag(pk, version, join_queue.pending_count(int(pk)))
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        since = request.query_params.get('since')
         session = self.get_object()
-        serializer = self.get_serializer(session)
-        return Response(serializer.data)
+        if since is None:
+            serializer = self.get_serializer(session)
+        else:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response({'error': 'since must be an integer version.'}, status=status.HTTP_400_BAD_REQUEST)
+            new_participants = User.objects.filter(
+                sessionparticipant__session=session, sessionparticipant__joined_version__gt=since
+            ).order_by('sessionparticipant__joined_version')
+            serializer = QuizSessionDeltaSerializer(session, context={'new_participants': new_participants})
+        etag = QuizSession.make_etag(session.pk, session.version, join_queue.pending_count(session.pk))
+        return Response(serializer.data, headers={'ETag': etag})
 
     @action(detail=True, methods=['post'], url_path='start')
+    @serialized_write
     def start_game(self, request, pk=None):
         """
         Allows the host to start the quiz for all participants.
         """
         session = self.get_object()
-        if session.host != request.user:
+        if session.host_id != request.user.pk:
             return Response({'error': 'Only the host can start the quiz.'}, status=status.HTTP_403_FORBIDDEN)
         
-        session.status = 'in_progress'
-        session.save()
+        try:
+            start_session(session)
+        except InvalidTransition as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         return Response({'message': 'Quiz started.'})
 
+    @action(detail=True, methods=['post'], url_path='finish')
+    @serialized_write
+    def finish_game(self, request, pk=None):
+        """
+        Allows the host to end the quiz for all participants. Answers given
+        live through `answer` are saved as results at this point.
+        """
+        session = self.get_object()
+        if session.host_id != request.user.pk:
+            return Response({'error': 'Only the host can finish the quiz.'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            finish_session(session)
+        except InvalidTransition as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'message': 'Quiz finished.'})
+
     @action(detail=True, methods=['post'])
+    def answer(self, request, pk=None):
+        """
+        Scores a single answer to the currently open question of a live game.
+        """
+        session = self.get_object()
+        game = games.get(session)
+        if game is None:
+            return Response({'error': 'The quiz is not in progress.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            question_id = int(request.data.get('question_id'))
+            choice_id = int(request.data.get('choice_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'question_id and choice_id are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            correct = game.answer(request.user.pk, question_id, choice_id)
+        except AnswerRejected as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'correct': correct, 'score': game.score_of(request.user.pk)})
+
+    @action(detail=True, methods=['post'], throttle_classes=[SubmitUserThrottle, SubmitRoomThrottle])
+    @serialized_write
     def submit(self, request, pk=None):
         """
         Receives and scores a user's answers for a quiz within a session.
         """
         session = self.get_object()
-        quiz = session.quiz
         user_answers = request.data.get('answers', {})
-        score = 0
-        total_questions = quiz.questions.count()
 
-        for question in quiz.questions.all():
-            try:
-                correct_choice = Choice.objects.get(question=question, is_correct=True)
-                user_choice_id = user_answers.get(str(question.id))
-                if user_choice_id and int(user_choice_id) == correct_choice.id:
-                    score += 1
-            except Choice.DoesNotExist:
-                # This handles cases where a question might not have a correct answer marked.
-                pass 
-        
-        # Create a record of the user's score for this quiz.
-        QuizResult.objects.create(
-            user=request.user, quiz=quiz, score=score, total_questions=total_questions
-        )
+        # Score against the compiled answer key instead of querying every question.
+        answer_key = get_answer_key(session.quiz_id)
+        score = answer_key.score(user_answers)
+        total_questions = answer_key.total_questions
+
+        # Create a record of the user's score for this quiz; the leaderboard
+        # total is updated in the same transaction (see quiz.signals).
+        with transaction.atomic():
+            QuizResult.objects.create(
+                user=request.user, quiz_id=session.quiz_id, score=score, total_questions=total_questions
+            )
+            session.bump_version()
+        game = games.get(session)
+        if game is not None:
+            # The result is written now, so the live game must not write another.
+            game.mark_submitted(request.user.pk)
         return Response({'score': score, 'total_questions': total_questions})
 
     @action(detail=False, methods=['get'], url_path='leaderboard')
+    @replica_reads
     def leaderboard(self, request):
         """
-        Calculates and returns the top 10 players based on total score.
+        Returns the top 10 players based on total score, read from the
+        PlayerScore index (or its in-memory copy).
         """
-        user_scores = User.objects.annotate(
-            total_score=Sum('quizresult__score')
-        ).filter(
-            total_score__isnull=False
-        ).order_by(
-            '-total_score'
-        )[:10]
-
+        user_scores = top_scores.top()
         serializer = LeaderboardSerializer(user_scores, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+@require_GET
+async def lobby_status_wait(request, pk):
+    """
+    Long-poll variant of `status`. Returns the lobby at once if its ETag
+    differs from If-None-Match; otherwise parks the request on the
+    session's in-memory event until someone joins, the game starts or
+    finishes, or `?timeout=` seconds (at most QUIZ_LONG_POLL_TIMEOUT) pass,
+    in which case it returns 304. Parked requests hold no thread or
+    database connection.
+    """
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    user = await get_token_user(key) if keyword == 'Token' and key else None
+    if user is None or not user.is_authenticated:
+        return JsonResponse(
+            {'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED
+        )
+    max_timeout = getattr(settings, 'QUIZ_LONG_POLL_TIMEOUT', 25)
+    try:
+        timeout = float(request.GET.get('timeout', max_timeout))
+    except ValueError:
+        timeout = math.nan
+    if not math.isfinite(timeout):
+        return JsonResponse({'error': 'timeout must be a number of seconds.'}, status=status.HTTP_400_BAD_REQUEST)
+    timeout = max(0, min(timeout, max_timeout))
+
+    async with session_waiters.listen(pk) as changed:
+        etag = await sync_to_async(lobby_etag)(pk)
+        if etag is None:
+            return JsonResponse({'error': 'Session not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    body, etag = await sync_to_async(lobby_body)(pk)
+    if body is None:
+        return JsonResponse({'error': 'Session not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
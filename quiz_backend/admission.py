@@ -0,0 +1,102 @@
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+
+class WriteAdmission:
+    """
+    Counts the write requests in flight in this process.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def enter(self, limit):
+        """
+        Admits one more write unless `limit` are already in flight.
+        """
+        with self._lock:
+            if self.active >= limit:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+
+write_admission = WriteAdmission()
+
+
+def is_write_endpoint(request):
+    """
+    Whether the request is routed to a view marked with
+    quiz_backend.sqlite.serialized_write.
+    """
+    if request.method in ('GET', 'HEAD', 'OPTIONS'):
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    handler = match.func
+    actions = getattr(handler, 'actions', None)
+    if actions:
+        handler = getattr(handler.cls, actions.get(request.method.lower(), ''), None)
+    return getattr(handler, 'write_endpoint', False)
+
+
+class WriteAdmissionMiddleware:
+    """
+    Caps the write requests a process works on at QUIZ_MAX_CONCURRENT_WRITES,
+    counted from the moment they arrive. Beyond that, writes are answered
+    at once with 429 and Retry-After (QUIZ_WRITE_RETRY_AFTER seconds)
+    instead of queueing without bound for the database, a thread or the
+    write queue. Async-capable, so under ASGI the count includes requests
+    still waiting for a sync thread. Removed from the stack when the limit
+    is not set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.limit = getattr(settings, 'QUIZ_MAX_CONCURRENT_WRITES', None)
+        if not self.limit:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_write_endpoint(request):
+            return self.get_response(request)
+        if not write_admission.enter(self.limit):
+            return self.shed()
+        try:
+            return self.get_response(request)
+        finally:
+            write_admission.leave()
+
+    async def __acall__(self, request):
+        if not is_write_endpoint(request):
+            return await self.get_response(request)
+        if not write_admission.enter(self.limit):
+            return self.shed()
+        try:
+            return await self.get_response(request)
+        finally:
+            write_admission.leave()
+
+    def shed(self):
+        response = JsonResponse({'error': 'Too many writes in progress, please retry shortly.'}, status=429)
+        response['Retry-After'] = str(getattr(settings, 'QUIZ_WRITE_RETRY_AFTER', 1))
+        return response
@@ -5,4 +5,18 @@ settings_module= 'quiz_backend.deployment_settings' if 'RENDER_EXTERNAL_HOSTNAME
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
 
-application = get_asgi_application()
+# Initialize Django before importing anything that touches the models.
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+
+from quiz.routing import websocket_urlpatterns
+from users.authentication import TokenAuthMiddleware
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
@@ -0,0 +1,16 @@
+# Timing output shared by the bench_* management commands.
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.1f}ms"
+
+
+def us(seconds):
+    return f"{seconds * 1e6:.0f}us"
+
+
+def percentiles(timings, unit=ms):
+    """
+    Formats the median and 99th percentile of a sorted list of durations in seconds.
+    """
+    return f"p50 {unit(timings[len(timings) // 2])}, p99 {unit(timings[int(len(timings) * 0.99)])}"
@@ -0,0 +1,144 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+
+
+class RoutingState:
+    """
+    Per-request routing flags. A mutable object rather than plain context
+    variables, so writes made in a thread-pool copy of the request context
+    (async views) are still seen by the middleware.
+    """
+
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def is_pinned(user):
+    """
+    Whether the user wrote recently enough that a replica may not have
+    their write yet.
+    """
+    return bool(user and user.is_authenticated and pin_cache().get(pin_key(user.pk)))
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes, and by default reads, to the primary ('default'). Reads
+    go to a random replica from DATABASE_REPLICAS only inside views marked
+    with @replica_reads, and never once the request has written.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def replica_reads(view_method):
+    """
+    Marks a ViewSet action whose reads may be served by a replica: hot,
+    read-only endpoints that tolerate a little replication lag. Users who
+    wrote within the last REPLICA_PIN_SECONDS keep reading from the primary,
+    so e.g. `join` followed by `status` always sees the join.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        state = _routing.get()
+        if state is None or is_pinned(request.user):
+            return view_method(self, request, *args, **kwargs)
+        state.use_replica = True
+        try:
+            return view_method(self, request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+    return wrapper
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Tracks whether a request wrote to the database and, if it did, pins the
+    user to the primary for REPLICA_PIN_SECONDS. Removed from the stack
+    entirely unless DATABASE_REPLICAS is set. Async-capable, so it does not
+    tie up a thread while an async view (e.g. a long poll) waits.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self.writer(request, state):
+            pin_cache().set(pin_key(request.user.pk), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self.writer(request, state):
+            await pin_cache().aset(pin_key(request.user.pk), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
+
+    @staticmethod
+    def writer(request, state):
+        # Only a request that wrote looks at the user, which may be lazy.
+        user = getattr(request, 'user', None)
+        return state.wrote and user is not None and user.is_authenticated
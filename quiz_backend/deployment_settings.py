@@ -1,9 +1,11 @@
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Import all settings from the base settings.py file.
 # Any settings defined here will override the base settings.
 from .settings import *
+from .sqlite_settings import sqlite_database
 
 
 # --- Core Deployment Settings ---
@@ -28,6 +30,53 @@ ALLOWED_HOSTS = [os.environ.get('WEB_DOMAIN'), 'localhost']
 DATABASES = {
     'default': dj_database_url.config(default=os.environ.get('DATABASE_URL'))
 }
+# Small deployments may keep SQLite (DATABASE_URL=sqlite:////path/db.sqlite3);
+# give it the production SQLite profile.
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    DATABASES['default'] = sqlite_database(DATABASES['default']['NAME'])
+
+# Optional read replicas for the hot read endpoints, as a comma-separated
+# list of database URLs in DATABASE_REPLICA_URLS.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = dj_database_url.parse(url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+# A user who just wrote is pinned to 'default' through REPLICA_PIN_CACHE; a
+# per-process cache would let their next request on another worker read a
+# stale replica.
+if DATABASE_REPLICAS and not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured(
+        "DATABASE_REPLICA_URLS needs REDIS_URL, so read-your-writes pins are shared between workers."
+    )
+
+
+# --- Channel Layer and Shared Caches ---
+# Use Redis so lobby events reach sockets connected to any worker process.
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['REDIS_URL']]},
+        },
+    }
+    # Share resolved auth tokens between workers as well.
+    CACHES['tokens'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': 300,
+    }
+    # The join/submit throttle buckets, so limits hold across workers.
+    CACHES['throttle'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+    # And the hot room state, so players of one room can hit any worker.
+    QUIZ_STATE_BACKEND = {
+        'BACKEND': 'quiz.state.RedisStateBackend',
+        'OPTIONS': {'url': os.environ['REDIS_URL']},
+    }
 
 
 # --- Static Files (CSS, JavaScript, Images) ---
@@ -0,0 +1,184 @@
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; memory does not grow with the number of observations.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, action):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{action="{action}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{action="{action}",le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{action="{action}"}} {self.sum}')
+        lines.append(f'{name}_count{{action="{action}"}} {self.count}')
+        return lines
+
+
+METRICS = (
+    # name, help, buckets
+    ('quiz_request_seconds', 'Total time spent handling the request.', LATENCY_BUCKETS),
+    ('quiz_request_db_seconds', 'Time spent executing database queries.', LATENCY_BUCKETS),
+    ('quiz_request_view_seconds', 'Time in the view outside the database, mostly serializers.', LATENCY_BUCKETS),
+    ('quiz_request_render_seconds', 'Time spent rendering the response body.', LATENCY_BUCKETS),
+    ('quiz_request_queries', 'Number of database queries issued.', QUERY_BUCKETS),
+)
+
+
+class Registry:
+    """
+    Histograms per action label. The label set is bounded by the URL conf.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, action, **values):
+        with self._lock:
+            histograms = self._histograms.get(action)
+            if histograms is None:
+                histograms = self._histograms[action] = {
+                    name: Histogram(buckets) for name, _, buckets in METRICS
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def render(self):
+        """
+        Returns every histogram in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, help_text, _ in METRICS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for action in sorted(self._histograms):
+                    lines.extend(self._histograms[action][name].render(name, action))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+def action_label(view_func, request):
+    """
+    Names a request after the endpoint it hit: the `url_path` of a ViewSet
+    action (`host`, `join`, `status`, ...) or the URL name of a plain view.
+    """
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), '')
+        handler = getattr(view_func.cls, action, None)
+        return getattr(handler, 'url_path', action)
+    match = request.resolver_match
+    return (match.url_name if match else None) or view_func.__name__
+
+
+class QueryTimer:
+    """
+    Execute wrapper counting queries and the time they take.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Records query count, DB time, view time, render time and total latency
+    for every routed request. Removed from the stack entirely (zero cost)
+    unless QUIZ_METRICS_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUIZ_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        end = time.perf_counter()
+
+        label = getattr(request, '_metrics_action', None)
+        if label is None:
+            # Not routed to a view (404s, static files).
+            return response
+        view_end = getattr(request, '_metrics_render_start', None) or end
+        view_start = request._metrics_view_start
+        registry.observe(
+            label,
+            quiz_request_seconds=end - start,
+            quiz_request_db_seconds=timer.seconds,
+            quiz_request_view_seconds=max(view_end - view_start - timer.seconds, 0.0),
+            quiz_request_render_seconds=end - view_end,
+            quiz_request_queries=timer.count,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_action = action_label(view_func, request)
+        request._metrics_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and right before the response is rendered.
+        request._metrics_render_start = time.perf_counter()
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Exposes the request histograms for Prometheus. Admin users only.
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
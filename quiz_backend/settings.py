@@ -1,5 +1,7 @@
 from pathlib import Path
 
+from .sqlite_settings import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -16,6 +18,7 @@ ALLOWED_HOSTS = ['*'] # Allow all hosts for development
 
 # Application definition
 INSTALLED_APPS = [
+    'daphne',                   # ASGI runserver, needed for WebSockets
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -34,9 +37,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz_backend.metrics.MetricsMiddleware', # Per-endpoint metrics, see QUIZ_METRICS_ENABLED
+    'quiz_backend.db_router.DatabaseRoutingMiddleware', # Replica pinning, see DATABASE_REPLICAS
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # CORS middleware
+    'quiz_backend.admission.WriteAdmissionMiddleware', # Sheds writes, see QUIZ_MAX_CONCURRENT_WRITES
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -63,15 +69,70 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'quiz_backend.wsgi.application'
+ASGI_APPLICATION = 'quiz_backend.asgi.application'
+
+# --- Channels (push lobby updates over WebSockets) ---
+# The in-memory layer only fans out within one process; fine for development.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# SQLite runs with WAL, tuned pragmas and persistent connections; see
+# quiz_backend.sqlite_settings.sqlite_database.
 DATABASES = {
-    'default': {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+    # A read-only second connection to the same file. To try replica routing
+    # locally with two files, point NAME at a copy kept fresh by
+    # `manage.py sync_sqlite_replica` and add 'replica' to DATABASE_REPLICAS.
+    'replica': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {'init_command': 'PRAGMA query_only=1'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Hot read-only endpoints (see quiz_backend.db_router.replica_reads) read from
+# a random alias in DATABASE_REPLICAS; everything else uses 'default'. A user
+# who wrote in the last REPLICA_PIN_SECONDS keeps reading from 'default'.
+DATABASE_ROUTERS = ['quiz_backend.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE = 'tokens'  # shared between workers in deployment
+
+# SQLite allows one writer at a time. Write endpoints queue for it within a
+# process (SQLITE_WRITE_QUEUE) and, when another process holds the lock past
+# the connection timeout, are retried with exponential backoff.
+SQLITE_WRITE_QUEUE = True
+SQLITE_BUSY_RETRIES = 3
+SQLITE_BUSY_BACKOFF_MS = 25
+
+# Caches
+# Resolved auth tokens are kept in the 'tokens' cache (see TOKEN_AUTH_CACHE).
+# LocMemCache is a per-process LRU; use a shared backend to share it across workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tokens',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Token buckets of the join/submit throttles (see quiz.throttling).
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
+TOKEN_AUTH_CACHE = 'tokens'
+QUIZ_THROTTLE_CACHE = 'throttle'
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -82,6 +143,15 @@ AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator', },
 ]
 
+# Login/register hash passwords in a dedicated thread pool (users.hashing;
+# login through users.backends.HashingPoolBackend).
+# None means one worker per CPU. Request threads wait for their hash, so
+# once MAX_PENDING hashes (default one per worker) are in flight, further
+# sign-ins get a 503 with Retry-After instead of a blocked thread.
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_MAX_PENDING = None
+AUTHENTICATION_BACKENDS = ['users.backends.HashingPoolBackend']
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 LANGUAGE_CODE = 'en-us'
@@ -104,11 +174,34 @@ AUTH_USER_MODEL = 'users.CustomUser'
 # --- Django REST Framework Settings ---
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON when installed; swap in quiz.renderers.JSONRenderer and
+    # quiz.parsers.JSONParser to use only the standard library.
+    'DEFAULT_RENDERER_CLASSES': (
+        'quiz.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'quiz.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Token buckets for join and submit (quiz.throttling): 'N/period' allows
+    # bursts of N and refills N per period, per user and per room. A room
+    # may take a burst of 1,200 joins (a full lobby arriving at once) and as
+    # many submissions (everyone answering the last question together), then
+    # 20 of each per second, about a fifth of what one SQLite node writes per
+    # second. With QUIZ_JOIN_BATCHING the room join bucket is not applied.
+    'DEFAULT_THROTTLE_RATES': {
+        'join_user': '10/min',
+        'join_room': '1200/min',
+        'submit_user': '10/min',
+        'submit_room': '1200/min',
+    },
 }
 
 # --- CORS Settings ---
@@ -118,4 +211,61 @@ CORS_ALLOW_ALL_ORIGINS = True
 # --- Email Settings (for Password Reset) ---
 # For development, prints emails to the console instead of sending them.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-DEFAULT_FROM_EMAIL = 'noreply@quizapp.com'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'noreply@quizapp.com'
+
+# Password reset requests only queue a row in the email outbox (see
+# users.outbox); a background thread per process sends due emails in
+# batches of EMAIL_OUTBOX_BATCH_SIZE over one connection, waking on each
+# request and every EMAIL_OUTBOX_INTERVAL_SECONDS. Failed sends are retried
+# with exponential backoff from EMAIL_OUTBOX_RETRY_SECONDS, up to
+# EMAIL_OUTBOX_MAX_ATTEMPTS. Set EMAIL_OUTBOX_WORKER = False to send from
+# `manage.py send_outbox --loop` instead.
+EMAIL_OUTBOX_WORKER = True
+EMAIL_OUTBOX_INTERVAL_SECONDS = 5
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_RETRY_SECONDS = 30
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+
+# --- Quiz Settings ---
+# Where hot room state (live scores, lobby rosters) lives; see quiz.state.
+# In-process suits a single worker. For several workers on one host use
+# 'quiz.state.SQLiteStateBackend' with OPTIONS {'path': '/dev/shm/quiz-state.sqlite3'};
+# across hosts, 'quiz.state.RedisStateBackend' with {'url': 'redis://...'}.
+QUIZ_STATE_BACKEND = {
+    'BACKEND': 'quiz.state.InProcessStateBackend',
+}
+
+# Batch lobby joins: acknowledge from an in-memory roster and write the
+# participant rows with one bulk insert per session every QUIZ_JOIN_FLUSH_MS.
+QUIZ_JOIN_BATCHING = False
+QUIZ_JOIN_FLUSH_MS = 200
+
+# Advance live games to the next question on the server when a question's
+# time limit runs out (one timing-wheel thread per process). Deadlines are
+# kept in QUIZ_STATE_BACKEND; a game whose deadline passed more than
+# QUIZ_SCHEDULER_SWEEP_SECONDS ago is taken over by another worker, so with
+# several workers use a shared state backend.
+QUIZ_QUESTION_SCHEDULER = True
+QUIZ_SCHEDULER_TICK_MS = 100
+QUIZ_SCHEDULER_SWEEP_SECONDS = 5
+
+# Write requests (see quiz_backend.sqlite.serialized_write) a process works
+# on at once; more are answered 429 with Retry-After: QUIZ_WRITE_RETRY_AFTER
+# seconds instead of queueing. None removes the limit.
+QUIZ_MAX_CONCURRENT_WRITES = 32
+QUIZ_WRITE_RETRY_AFTER = 1
+
+# Longest a `status/wait/` long-poll request is held open, in seconds. The
+# waiting requests are parked on the event loop when served over ASGI
+# (daphne), as long as every middleware is async-capable; the metrics
+# middleware is not, so leave QUIZ_METRICS_ENABLED off on long-poll workers.
+QUIZ_LONG_POLL_TIMEOUT = 25
+
+# Record per-endpoint query counts and timings, exposed to admins in
+# Prometheus format at /api/metrics/. The middleware unloads itself when off.
+QUIZ_METRICS_ENABLED = False
+
+# Finished sessions older than this are moved to the compact archive table
+# by `manage.py archive_sessions` (run it from cron).
+QUIZ_ARCHIVE_AFTER_DAYS = 30
@@ -0,0 +1,108 @@
+import logging
+import random
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+
+def is_database_locked(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc)
+
+
+class WriteQueue:
+    """
+    Lets one thread of this process write at a time, in arrival order.
+
+    SQLite has a single writer anyway; queueing here keeps threads from
+    spinning in SQLite's busy handler and serves them first come, first
+    served. Re-entrant, so a write endpoint may call code that also queues.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._now_serving = 0
+        self._owner = None
+        self._depth = 0
+
+    def __enter__(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return self
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._condition.wait_for(lambda: self._now_serving == ticket)
+            self._owner = me
+            self._depth = 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._now_serving += 1
+                self._condition.notify_all()
+
+
+write_queue = WriteQueue()
+
+
+def write_lock():
+    """
+    The process-wide write queue when SQLITE_WRITE_QUEUE is on and the
+    primary is SQLite, otherwise a no-op context manager.
+    """
+    if getattr(settings, 'SQLITE_WRITE_QUEUE', False) and connection.vendor == 'sqlite':
+        return write_queue
+    return nullcontext()
+
+
+def retry_on_busy(func, *args, **kwargs):
+    """
+    Calls func, retrying with jittered exponential backoff (starting at
+    SQLITE_BUSY_BACKOFF_MS) up to SQLITE_BUSY_RETRIES times while the
+    database is locked by another process. Never retries once an enclosing
+    transaction is marked for rollback.
+    """
+    retries = getattr(settings, 'SQLITE_BUSY_RETRIES', 3)
+    backoff = getattr(settings, 'SQLITE_BUSY_BACKOFF_MS', 25) / 1000
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_database_locked(e) or attempt == retries or connection.needs_rollback:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning("Database locked, retrying in %.0fms", delay * 1000)
+            time.sleep(delay)
+
+
+def serialized_write(view_method=None, *, retry=True):
+    """
+    Marks a write endpoint: it runs through the write queue and, with
+    `retry`, is repeated when SQLite reports the database locked. Only
+    retry views whose writes are one transaction, or that are idempotent.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(*args, **kwargs):
+            with write_lock():
+                if retry:
+                    return retry_on_busy(view_method, *args, **kwargs)
+                return view_method(*args, **kwargs)
+        # Lets WriteAdmissionMiddleware (quiz_backend.admission) find write endpoints.
+        wrapper.write_endpoint = True
+        return wrapper
+
+    if view_method is None:
+        return decorator
+    return decorator(view_method)
@@ -3,6 +3,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -10,4 +12,6 @@ urlpatterns = [
     path('api/quiz-sessions/', include('quiz.urls')), 
     
     path('api/users/', include('users.urls')),
+
+    path('api/metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
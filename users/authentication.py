@@ -0,0 +1,77 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_cache():
+    return caches[getattr(settings, 'TOKEN_AUTH_CACHE', 'default')]
+
+
+def token_cache_key(key):
+    return f'auth-token:{key}'
+
+
+def invalidate_token(key):
+    """
+    Drops a token from the authentication cache, e.g. once it is deleted.
+    """
+    token_cache().delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    """
+    Drops every cached token of a user, e.g. after their password changes.
+    """
+    keys = Token.objects.filter(user=user).values_list('key', flat=True)
+    token_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for DRF's TokenAuthentication that keeps resolved
+    tokens in the TOKEN_AUTH_CACHE cache (a bounded, expiring LRU by
+    default; point it at a shared backend to share across workers), so an
+    authenticated request does not have to query the token and user tables.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (user, token))
+        return user, token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware:
+    """
+    ASGI middleware that authenticates WebSocket connections with the same
+    DRF tokens as the REST API, passed as `?token=<key>` (browsers cannot set
+    an Authorization header on a WebSocket handshake).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        key = query.get('token', [None])[0]
+        scope = dict(scope, user=await get_token_user(key) if key else AnonymousUser())
+        return await self.app(scope, receive, send)
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import hashing_pool
+
+UserModel = get_user_model()
+
+
+class HashingPoolBackend(ModelBackend):
+    """
+    ModelBackend with the password hashing done in the hashing pool
+    (users.hashing), so sign-in bursts are bounded and shed with
+    HashingPoolBusy. Everything else, including the database access and
+    rehashing outdated passwords on login, happens as in ModelBackend.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so response time does not reveal whether the user exists.
+            hashing_pool.call(hashers.make_password, password)
+            return None
+        if self.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def check_password(self, user, password):
+        """
+        Like user.check_password: upgrades the stored hash when the hasher
+        or its work factor changed.
+        """
+        is_correct, must_update = hashing_pool.call(hashers.verify_password, password, user.password)
+        if is_correct and must_update:
+            user.password = hashing_pool.call(hashers.make_password, password)
+            user.save(update_fields=['password'])
+        return is_correct
@@ -0,0 +1,71 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class HashingPoolBusy(Exception):
+    """
+    Raised instead of queueing when too many hashes are already waiting.
+    """
+
+
+class HashingPool:
+    """
+    Dedicated thread pool for password hashing.
+
+    PBKDF2 (hashlib.pbkdf2_hmac) releases the GIL, so hashes run in
+    parallel across cores. Callers block on their hash, so by default at
+    most one hash per worker may be in flight: a sign-in either gets a
+    hashing thread at once or HashingPoolBusy, and a login burst sheds load
+    instead of parking every request thread behind a queue.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers if max_pending is None else max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hashing')
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingPoolBusy
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def call(self, func, *args):
+        """
+        Runs func(*args) in the pool and returns its result, or raises
+        HashingPoolBusy when max_pending hashes are already in flight.
+        """
+        self._acquire()
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self._release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hashing_pool = HashingPool(
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', None),
+    max_pending=getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', None),
+)
@@ -0,0 +1,83 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from quiz_backend.benchmarks import percentiles
+from quiz_backend.sqlite_settings import sqlite_database
+from users.hashing import HashingPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for /api/users/login/: request threads post logins as fast "
+        "as they can, for several hashing-pool sizes, and report accepted "
+        "logins per second, their latency, and how many were shed with 503. "
+        "Runs on a throwaway SQLite file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4', help="Comma-separated hashing-pool sizes.")
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent request threads.")
+        parser.add_argument('--logins', type=int, default=8, help="Logins per request thread.")
+
+    def handle(self, **options):
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict)
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                connection.close()
+                settings_dict.update(sqlite_database(os.path.join(directory, 'bench.sqlite3')))
+                call_command('migrate', verbosity=0)
+                self.run(**options)
+            finally:
+                connection.close()
+                settings_dict.clear()
+                settings_dict.update(original)
+
+    def run(self, workers, threads, logins, **options):
+        get_user_model().objects.create_user(
+            username='bench_login', email='bench_login@example.com', password='benchmark-password'
+        )
+        for count in (int(w) for w in workers.split(',')):
+            pool = HashingPool(count)
+            with mock.patch('users.backends.hashing_pool', pool):
+                elapsed, timings, shed = self.phase(threads, logins)
+            pool.shutdown()
+            timings.sort()
+            latency = percentiles(timings) if timings else "none accepted"
+            self.stdout.write(
+                f"workers={count:<2} {len(timings) / elapsed:7.1f} logins/s  {latency}, {shed} shed with 503"
+            )
+
+    def phase(self, threads, logins):
+        timings, statuses = [], []
+
+        def login():
+            client = APIClient(raise_request_exception=False)
+            for _ in range(logins):
+                t0 = time.perf_counter()
+                response = client.post(
+                    '/api/users/login/', {'username': 'bench_login', 'password': 'benchmark-password'}, format='json'
+                )
+                if response.status_code == 200:
+                    timings.append(time.perf_counter() - t0)
+                statuses.append(response.status_code)
+            connection.close()
+
+        start = time.perf_counter()
+        request_threads = [threading.Thread(target=login) for _ in range(threads)]
+        for thread in request_threads:
+            thread.start()
+        for thread in request_threads:
+            thread.join()
+        return time.perf_counter() - start, timings, statuses.count(503)
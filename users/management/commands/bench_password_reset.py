@@ -0,0 +1,150 @@
+import os
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from quiz_backend.sqlite_settings import sqlite_database
+from users.models import OutboxEmail
+from users.outbox import enqueue, password_reset_message, send_batch
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Just enough SMTP for smtplib, with a delay on the greeting (connection
+    setup) and on each accepted message.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake, per_message):
+        self.handshake = handshake
+        self.per_message = per_message
+        self.received = 0
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.server.handshake)
+        self.reply('220 bench ESMTP')
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.reply('354 go ahead')
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                time.sleep(self.server.per_message)
+                self.server.received += 1
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares password reset requests that send inline (the old view) with "
+        "ones that only queue an outbox row, for known and unknown addresses, "
+        "then the outbox sender's throughput with one SMTP connection per "
+        "message and per batch. Mail goes to a local SMTP stand-in with "
+        "configurable latency; runs on a throwaway SQLite file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=40, help="Timed requests per case.")
+        parser.add_argument('--emails', type=int, default=200, help="Queued emails for the sender runs.")
+        parser.add_argument('--handshake-ms', type=float, default=20, help="SMTP connection setup latency.")
+        parser.add_argument('--message-ms', type=float, default=2, help="SMTP latency per message.")
+
+    def handle(self, **options):
+        settings_dict = connection.settings_dict
+        original = dict(settings_dict)
+        server = SMTPStandIn(options['handshake_ms'] / 1000, options['message_ms'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                connection.close()
+                settings_dict.update(sqlite_database(os.path.join(directory, 'bench.sqlite3')))
+                call_command('migrate', verbosity=0)
+                with override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                    EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+                    EMAIL_OUTBOX_WORKER=False,
+                ):
+                    self.run(options['requests'], options['emails'])
+            finally:
+                connection.close()
+                settings_dict.clear()
+                settings_dict.update(original)
+                server.shutdown()
+                server.server_close()
+
+    def run(self, requests, emails):
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(username=f'bench_reset_{i}', email=f'bench_reset_{i}@example.com') for i in range(emails)
+        ])
+        client = APIClient()
+
+        def inline(email):
+            # What the view used to do: look the user up and send before answering.
+            message = password_reset_message(email)
+            if message is not None:
+                message.send()
+
+        def queued(email):
+            client.post('/api/users/reset-password/', {'email': email}, format='json')
+
+        queued('nobody@example.com')
+        for name, request in (('inline send', inline), ('outbox', queued)):
+            for kind, email in (('known', 'bench_reset_0@example.com'), ('unknown', 'nobody@example.com')):
+                timings = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    request(email)
+                    timings.append(time.perf_counter() - start)
+                self.stdout.write(
+                    f"[{name}] {kind} address: median {statistics.median(timings) * 1e3:.1f}ms, "
+                    f"max {max(timings) * 1e3:.1f}ms"
+                )
+        OutboxEmail.objects.all().delete()
+        original_open = SMTPBackend.open
+
+        for name, batch_size in (('connection per message', 1), ('connection per batch', 50)):
+            for i in range(emails):
+                enqueue('password_reset', f'bench_reset_{i}@example.com')
+            opened = 0
+
+            def counting_open(backend):
+                nonlocal opened
+                created = original_open(backend)
+                opened += bool(created)
+                return created
+
+            start = time.perf_counter()
+            with mock.patch.object(SMTPBackend, 'open', counting_open):
+                while send_batch(batch_size):
+                    pass
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"[sender] {name}: {emails / elapsed:.0f} emails/s, {opened} SMTP connections"
+            )
+
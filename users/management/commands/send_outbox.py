@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from users.outbox import outbox_sender, send_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the emails waiting in the outbox. With --loop keeps running and "
+        "polls every EMAIL_OUTBOX_INTERVAL_SECONDS, for deployments that set "
+        "EMAIL_OUTBOX_WORKER = False and send from a dedicated process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep sending until interrupted.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Default EMAIL_OUTBOX_BATCH_SIZE.")
+
+    def handle(self, loop, batch_size, **options):
+        if loop:
+            outbox_sender.run(batch_size=batch_size)
+            return
+        handled = 0
+        while count := send_batch(batch_size):
+            handled += count
+        self.stdout.write(self.style.SUCCESS(f"Handled {handled} queued emails."))
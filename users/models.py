@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     # By default, the email field in AbstractUser is not unique.
@@ -11,3 +12,31 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the background sender (users.outbox).
+    Only the kind and the address are stored; the message is rendered when
+    it is sent, so queueing one costs a single insert.
+    """
+    KIND_CHOICES = (
+        ('password_reset', 'Password reset'),
+    )
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    to = models.CharField(max_length=254)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not sent before this time: pushed forward while a sender holds the row
+    # and after each failed attempt.
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['send_after'], name='users_outbox_send_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {self.to}"
@@ -0,0 +1,177 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from quiz_backend.sqlite import write_lock
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def password_reset_message(to):
+    """
+    The reset email for the account with this address, or None if there is
+    no such account.
+    """
+    user = get_user_model().objects.filter(email=to).first()
+    if user is None:
+        return None
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+
+    # IMPORTANT: Replace with your actual frontend URL
+    reset_link = f"https://your-frontend-domain.com/reset-password/{uid}/{token}/"
+
+    subject = "Password Reset for Your Quiz App Account"
+    message = f"Hello,\n\nPlease click the link below to reset your password:\n{reset_link}\n\n"
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+# Builds the message of each OutboxEmail kind; None means nothing to send.
+RENDERERS = {
+    'password_reset': password_reset_message,
+}
+
+
+def enqueue(kind, to):
+    """
+    Queues an email and wakes the sender once the transaction commits.
+    """
+    OutboxEmail.objects.create(kind=kind, to=to)
+    transaction.on_commit(outbox_sender.wake)
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff after the n-th failed attempt, capped at an hour.
+    """
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def claim_batch(batch_size):
+    """
+    Takes up to `batch_size` due emails for this sender. Claimed rows are
+    pushed EMAIL_OUTBOX_LEASE_SECONDS into the future, so other senders
+    skip them and a sender that dies mid-batch only delays them.
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+    lease = timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    with write_lock(), transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(send_after__lte=now, attempts__lt=max_attempts)
+            .order_by('send_after')[:batch_size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                send_after=now + lease, attempts=F('attempts') + 1
+            )
+    for email in batch:
+        email.attempts += 1
+    return batch
+
+
+def send_batch(batch_size=None):
+    """
+    Sends one batch of due emails over a single mail connection and returns
+    how many rows it handled. Sent (or moot) rows are deleted; failed ones
+    are retried later with backoff, up to EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+    batch = claim_batch(batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50))
+    if not batch:
+        return 0
+    done, failed = [], []
+    # Several requests for the same address in one batch send one email.
+    seen = set()
+    connection = get_connection()
+    opened = False
+    try:
+        for email in batch:
+            if (email.kind, email.to) in seen:
+                done.append(email.pk)
+                continue
+            seen.add((email.kind, email.to))
+            try:
+                message = RENDERERS[email.kind](email.to)
+                if message is not None:
+                    if not opened:
+                        # Opened once and reused for the rest of the batch.
+                        connection.open()
+                        opened = True
+                    connection.send_messages([message])
+            except Exception as e:
+                logger.warning("Sending %s failed (attempt %d): %s", email, email.attempts, e)
+                email.last_error = f"{type(e).__name__}: {e}"
+                failed.append(email)
+                # The connection may be broken; the next message opens a new one.
+                connection.close()
+                opened = False
+            else:
+                done.append(email.pk)
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    for email in failed:
+        email.send_after = now + retry_delay(email.attempts)
+    with write_lock(), transaction.atomic():
+        OutboxEmail.objects.filter(pk__in=done).delete()
+        OutboxEmail.objects.bulk_update(failed, ['send_after', 'last_error'])
+    return len(batch)
+
+
+class OutboxSender:
+    """
+    Background thread draining the outbox: woken when an email is queued,
+    and polling every `interval` seconds for retries and for rows queued by
+    other processes.
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        if not getattr(settings, 'EMAIL_OUTBOX_WORKER', True):
+            # Sent by `manage.py send_outbox` instead.
+            return
+        self._ensure_running()
+        self._wake.set()
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def run(self, once=False, batch_size=None):
+        while True:
+            self._wake.clear()
+            try:
+                while send_batch(batch_size):
+                    pass
+            except Exception:
+                logger.exception("Sending the email outbox failed")
+            finally:
+                close_old_connections()
+            if once:
+                return
+            self._wake.wait(self.interval)
+
+
+outbox_sender = OutboxSender(interval=getattr(settings, 'EMAIL_OUTBOX_INTERVAL_SECONDS', 5))
@@ -21,10 +21,19 @@ class RegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
-        # Use create_user to handle password hashing
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password']
+        password_hash = validated_data.pop('password_hash', None)
+        if password_hash is None:
+            # Use create_user to handle password hashing
+            return User.objects.create_user(
+                username=validated_data['username'],
+                email=validated_data['email'],
+                password=validated_data['password']
+            )
+        # The password was already hashed off the request worker (see users.hashing).
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
+            password=password_hash,
         )
+        user.save()
         return user
\ No newline at end of file
@@ -1,3 +1,249 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from quiz.leaderboard import rebuild_player_scores
+from quiz.models import Quiz, QuizResult
+
+from .authentication import CachedTokenAuthentication, token_cache
+from . import outbox
+from .hashing import HashingPool, HashingPoolBusy
+from .models import OutboxEmail
+from .outbox import OutboxSender, enqueue, send_batch
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache().clear()
+        self.user = User.objects.create_user(username='alice', email='alice@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.factory = APIRequestFactory()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def authenticate(self, key=None):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_second_request_skips_the_database(self):
+        with self.assertNumQueries(1):
+            user, token = self.authenticate()
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.authenticate()
+        self.assertEqual((cached_user, cached_token), (user, token))
+
+    def test_logout_invalidates_the_cached_token(self):
+        self.authenticate()
+        response = self.client.post('/api/users/logout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post('/api/users/logout/').status_code, 401)
+
+    def test_deactivation_invalidates_the_cached_token(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_reset_invalidates_cached_user(self):
+        self.authenticate()
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        reset_token = default_token_generator.make_token(self.user)
+        response = APIClient().post(
+            f'/api/users/reset-password-confirm/{uid}/{reset_token}/',
+            {'new_password': 'n3w-Passw0rd', 'confirm_password': 'n3w-Passw0rd'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        user, _ = self.authenticate()
+        self.assertTrue(user.check_password('n3w-Passw0rd'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginRegisterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def register(self, **data):
+        payload = {'username': 'bob', 'email': 'bob@example.com', 'password': 's3cret-pass'}
+        payload.update(data)
+        return self.client.post('/api/users/register/', payload, format='json')
+
+    def test_register_then_login(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['user']['username'], 'bob')
+        self.assertTrue(User.objects.get(username='bob').check_password('s3cret-pass'))
+
+        response = self.client.post('/api/users/login/', {'username': 'bob', 'password': 's3cret-pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], body['token'])
+
+    def test_register_validation_errors(self):
+        self.register()
+        response = self.register(username='bob2')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_login_rejects_bad_credentials(self):
+        self.register()
+        for payload in ({'username': 'bob', 'password': 'wrong'}, {'username': 'nobody', 'password': 'x'}, {}):
+            response = self.client.post('/api/users/login/', payload, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Invalid Credentials'})
+
+    def test_login_accepts_form_data(self):
+        self.register()
+        response = self.client.post('/api/users/login/', {'username': 'bob', 'password': 's3cret-pass'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_inactive_users_cannot_log_in(self):
+        self.register()
+        User.objects.filter(username='bob').update(is_active=False)
+        response = self.client.post('/api/users/login/', {'username': 'bob', 'password': 's3cret-pass'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_full_hashing_pool_sheds_load(self):
+        self.register()
+        with mock.patch('users.backends.hashing_pool', HashingPool(workers=1, max_pending=0)):
+            response = self.client.post('/api/users/login/', {'username': 'bob', 'password': 's3cret-pass'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_hashing_pool_admits_one_hash_per_worker(self):
+        pool = HashingPool(workers=1)
+        self.addCleanup(pool.shutdown)
+        with self.assertRaises(HashingPoolBusy):
+            pool.call(pool.call, str, 'second')
+        self.assertEqual(pool.call(str, 'next'), 'next')
+
+    def test_failed_login_sends_user_login_failed(self):
+        self.register()
+        handler = mock.Mock()
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+        self.client.post('/api/users/login/', {'username': 'bob', 'password': 'wrong'}, format='json')
+        handler.assert_called_once()
+        self.assertEqual(handler.call_args.kwargs['credentials']['username'], 'bob')
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_login_upgrades_outdated_hashes(self):
+        encoded = PBKDF2PasswordHasher().encode('s3cret-pass', 'salt', iterations=1)
+        User.objects.create(username='carol', email='carol@example.com', password=encoded)
+        response = self.client.post('/api/users/login/', {'username': 'carol', 'password': 's3cret-pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(username='carol').password.startswith('md5$'))
+
+
+class MyStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def result(self, title, score, total_questions):
+        quiz = Quiz.objects.create(title=title, owner=self.user)
+        QuizResult.objects.create(user=self.user, quiz=quiz, score=score, total_questions=total_questions)
+
+    def test_no_results(self):
+        response = self.client.get('/api/users/me/stats/')
+        self.assertEqual(response.json(), {
+            'username': 'alice', 'quizzes_played': 0, 'total_score': 0, 'total_questions': 0,
+            'average_percentage': 0.0, 'best': None,
+        })
+
+    def test_stats_are_kept_on_write(self):
+        self.result('Algebra', 1, 4)
+        self.result('Physics', 3, 4)
+        self.result('History', 2, 4)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/stats/')
+        self.assertEqual(response.json(), {
+            'username': 'alice', 'quizzes_played': 3, 'total_score': 6, 'total_questions': 12,
+            'average_percentage': 50.0,
+            'best': {'quiz_title': 'Physics', 'score': 3, 'total_questions': 4, 'percentage': 75.0},
+        })
+        rebuild_player_scores()
+        self.assertEqual(self.client.get('/api/users/me/stats/').json(), response.json())
+
+
+class PasswordResetOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', email='alice@example.com')
+
+    def request_reset(self, email):
+        return APIClient().post('/api/users/reset-password/', {'email': email}, format='json')
+
+    def test_request_only_queues_the_email(self):
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks() as callbacks:
+            known = self.request_reset('alice@example.com')
+        unknown = self.request_reset('nobody@example.com')
+        self.assertEqual(known.status_code, 200)
+        self.assertEqual(known.json(), unknown.json())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(sorted(OutboxEmail.objects.values_list('to', flat=True)),
+                         ['alice@example.com', 'nobody@example.com'])
+        self.assertEqual(self.request_reset('not-an-email').status_code, 400)
+
+    def test_send_batch_sends_over_one_connection(self):
+        for email in ('alice@example.com', 'alice@example.com', 'nobody@example.com'):
+            enqueue('password_reset', email)
+        with mock.patch('users.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            self.assertEqual(send_batch(), 3)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        self.assertIn(f'/reset-password/{uid}/', mail.outbox[0].body)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_command_passes_the_batch_size(self):
+        command = 'users.management.commands.send_outbox'
+        with mock.patch(f'{command}.send_batch', return_value=0) as send:
+            call_command('send_outbox', '--batch-size', '7', stdout=StringIO())
+        send.assert_called_once_with(7)
+        with mock.patch(f'{command}.outbox_sender.run') as run:
+            call_command('send_outbox', '--loop', '--batch-size', '7')
+        run.assert_called_once_with(batch_size=7)
+        with mock.patch('users.outbox.send_batch', return_value=0) as send:
+            OutboxSender().run(once=True, batch_size=7)
+        send.assert_called_once_with(7)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_sends_are_retried_with_backoff(self):
+        enqueue('password_reset', 'alice@example.com')
+        with (
+            mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')),
+            self.assertLogs('users.outbox', 'WARNING'),
+        ):
+            send_batch()
+            email = OutboxEmail.objects.get()
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, 'OSError: down')
+            self.assertGreater(email.send_after, timezone.now())
+            # Not due yet, then given up after the last attempt.
+            self.assertEqual(send_batch(), 0)
+            OutboxEmail.objects.update(send_after=timezone.now())
+            send_batch()
+            OutboxEmail.objects.update(send_after=timezone.now())
+            self.assertEqual(send_batch(), 0)
+        self.assertEqual(OutboxEmail.objects.get().attempts, 2)
+        self.assertEqual(len(mail.outbox), 0)
@@ -3,6 +3,7 @@ from .views import (
     register_user, 
     login_user, 
     logout_user, 
+    my_stats,
     PasswordResetRequestAPI, 
     PasswordResetConfirmAPI
 )
@@ -11,6 +12,7 @@ urlpatterns = [
     path('register/', register_user, name="register"),
     path('login/', login_user, name="login"),
     path('logout/', logout_user, name="logout"),
+    path('me/stats/', my_stats, name="my_stats"),
     
     # URLs for the password reset flow
     path('reset-password/', PasswordResetRequestAPI.as_view(), name="reset_password_request"),
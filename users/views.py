@@ -1,9 +1,12 @@
-from django.conf import settings
+
 from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -12,12 +15,30 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from quiz.models import PlayerScore
+from quiz.serializers import PlayerStatsSerializer
+from quiz_backend.sqlite import serialized_write
+
+from .authentication import invalidate_user_tokens
+from .hashing import HashingPoolBusy, hashing_pool
+from .outbox import enqueue
 from .serializers import RegisterSerializer, UserSerializer
 
 # Get the active User model
 User = get_user_model()
 
 
+def _hashing_busy_response():
+    return Response(
+        {"error": "Too many sign-ins in progress, please retry shortly."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'},
+    )
+
+
+# Password hashing for register and login runs in the dedicated hashing
+# pool (users.hashing; login through users.backends.HashingPoolBackend), so
+# a burst of sign-ins is bounded and shed instead of pinning every worker.
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -25,11 +46,16 @@ def register_user(request):
     Handles user registration.
     """
     serializer = RegisterSerializer(data=request.data)
-    if serializer.is_valid():
-        user = serializer.save()
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        password_hash = hashing_pool.call(make_password, serializer.validated_data['password'])
+    except HashingPoolBusy:
+        return _hashing_busy_response()
+    with transaction.atomic():
+        user = serializer.save(password_hash=password_hash)
         token, _ = Token.objects.get_or_create(user=user)
-        return Response({"user": UserSerializer(user).data, "token": token.key}, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"user": UserSerializer(user).data, "token": token.key}, status=status.HTTP_201_CREATED)
 
 
 @api_view(['POST'])
@@ -40,7 +66,10 @@ def login_user(request):
     """
     username = request.data.get("username")
     password = request.data.get("password")
-    user = authenticate(username=username, password=password)
+    try:
+        user = authenticate(request, username=username, password=password)
+    except HashingPoolBusy:
+        return _hashing_busy_response()
     if user:
         token, _ = Token.objects.get_or_create(user=user)
         return Response({"user": UserSerializer(user).data, "token": token.key})
@@ -59,33 +88,38 @@ def logout_user(request):
     return Response({"error": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+@api_view(['GET'])
+def my_stats(request):
+    """
+    Returns the logged-in user's quiz statistics: one read of their
+    PlayerScore row, which is kept up to date on every submission.
+    """
+    stats = PlayerScore.objects.filter(user_id=request.user.pk).first() or PlayerScore()
+    stats.user = request.user
+    return Response(PlayerStatsSerializer(stats).data)
+
+
 class PasswordResetRequestAPI(APIView):
     """
-    Starts the password reset process by sending an email to the user.
+    Starts the password reset process by queueing an email to the user.
     """
     permission_classes = [AllowAny]
 
+    @serialized_write
     def post(self, request):
         email = request.data.get('email')
         if not email:
             return Response({'error': 'Email field is required.'}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            user = User.objects.get(email=email)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = default_token_generator.make_token(user)
-            
-            # IMPORTANT: Replace with your actual frontend URL
-            reset_link = f"https://your-frontend-domain.com/reset-password/{uid}/{token}/"
-
-            subject = "Password Reset for Your Quiz App Account"
-            message = f"Hello,\n\nPlease click the link below to reset your password:\n{reset_link}\n\n"
-            
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
-        except User.DoesNotExist:
-            # Do not reveal that the user does not exist
-            pass
-        
+            validate_email(email)
+        except ValidationError:
+            return Response({'error': 'Enter a valid email address.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One insert, whether or not the account exists: the background sender
+        # (users.outbox) looks the user up and sends the link, so neither SMTP
+        # latency nor the response time depends on the address.
+        enqueue('password_reset', email)
+
         # Always return a generic success message to prevent user enumeration
         return Response({'message': 'If an account with that email exists, a password reset link has been sent.'}, status=status.HTTP_200_OK)
 
@@ -116,6 +150,8 @@ class PasswordResetConfirmAPI(APIView):
 
             user.set_password(new_password)
             user.save()
+            # Cached authentications still hold the old user row.
+            invalidate_user_tokens(user)
             return Response({'message': 'Password has been reset successfully.'}, status=status.HTTP_200_OK)
         else:
             return Response({'error': 'Invalid reset link.'}, status=status.HTTP_400_BAD_REQUEST)